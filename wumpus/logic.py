@@ -33,7 +33,8 @@ Then we implement various functions for doing logical inference:
     tt_entails       Say if a statement is entailed by a KB
     pl_resolution    Do resolution on propositional sentences
     dpll_satisfiable See if a propositional sentence is satisfiable
-    WalkSAT          (not yet implemented)
+    DPLLSolver       Iterative, incremental DPLL over integer clauses
+    WalkSAT          Local search for a model
 
 And a few other functions:
 
@@ -42,7 +43,7 @@ And a few other functions:
     diff, simp       Symbolic differentiation and simplification
 """
 
-import itertools, re
+import itertools, re, heapq, collections
 import agents
 from utils import *
 
@@ -83,10 +84,13 @@ class KB(object):
 
 
 class PropKB(KB):
-    "A KB for propositional logic. Inefficient, with no indexing."
+    """A KB for propositional logic. Inefficient, with no indexing.
+    Queries are decided by entails(KB, query), such as pl_resolution;
+    by default, by truth-table enumeration (tt_entails)."""
 
-    def __init__(self, sentence=None):
+    def __init__(self, sentence=None, entails=None):
         self.clauses = []
+        self.entails = entails
         if sentence:
             self.tell(sentence)
 
@@ -96,7 +100,11 @@ class PropKB(KB):
 
     def ask_generator(self, query):
         "Yield the empty substitution if KB implies query; else nothing."
-        if tt_entails(Expr('&', *self.clauses), query):
+        if self.entails:
+            entailed = self.entails(self, query)
+        else:
+            entailed = tt_entails(Expr('&', *self.clauses), query)
+        if entailed:
             yield {}
 
     def retract(self, sentence):
@@ -563,32 +571,84 @@ def disjuncts(s):
 #______________________________________________________________________________
 
 def pl_resolution(KB, alpha):
-    "Propositional-logic resolution: say if alpha follows from KB. [Fig. 7.12]"
-    clauses = KB.clauses + conjuncts(to_cnf(~alpha))
-    new = set()
-    while True:
-        n = len(clauses)
-
-        print 'num_clauses:', n
-
-        pairs = [(clauses[i], clauses[j])
-                 for i in range(n) for j in range(i+1, n)]
-
-        print 'pairs:', len(pairs)
-
-        pairs_count = 0
-        for (ci, cj) in pairs:
-            pairs_count += 1
-            if pairs_count % 10000 == 0: print '   ', pairs_count
-            resolvents = pl_resolve(ci, cj)
-            if FALSE in resolvents: return True
-            new = new.union(set(resolvents))
-        if new.issubset(set(clauses)): return False
-
-        print 'new:', len(new)
-        
-        for c in new:
-            if c not in clauses: clauses.append(c)
+    """Propositional-logic resolution: say if alpha follows from KB. [Fig. 7.12]
+    This is a given-clause prover with the set-of-support strategy: every
+    resolution step involves a clause descended from ~alpha (so, if KB
+    itself is inconsistent, this may fail to notice).  Clauses are
+    frozensets of int literals; an index from each literal to the clauses
+    containing it means only complementary pairs are tried.  Tautologies
+    are deleted, and a resolvent is dropped if a clause already kept
+    subsumes it.  Literals refuted by a kept unit clause are deleted at
+    once (otherwise a long clause would be resolved away one literal at
+    a time, by every subset of those units).  The shortest waiting clause
+    is processed first.
+    >>> pl_resolution(PropKB(A & (A >> B)), B)
+    True
+    >>> pl_resolution(PropKB(A | B), B)
+    False
+    """
+    index = {}
+    def number(sym):
+        return index.setdefault(sym, len(index) + 1)
+    occurs = {}   # literal -> kept clauses containing it
+    owners = {}   # literal -> kept clauses filed under it (one per clause)
+    units = set() # literals of kept unit clauses
+    def simplify(clause):
+        refuted = [lit for lit in clause if -lit in units]
+        if refuted:
+            return clause.difference(refuted)
+        return clause
+    def subsumed(clause):
+        # A subset of clause is filed under one of its literals.
+        for lit in clause:
+            for other in owners.get(lit, ()):
+                if other <= clause:
+                    return True
+        return False
+    def keep(clause):
+        for lit in clause:
+            occurs.setdefault(lit, []).append(clause)
+        owners.setdefault(min(clause), []).append(clause)
+        if len(clause) == 1:
+            units.update(clause)
+    # Units first, so that they simplify the other clauses.
+    kb_clauses = []
+    for c in KB.clauses:
+        lits = clause_to_ints(c, number)
+        if lits is not None:
+            kb_clauses.append(frozenset(lits))
+    for clause in sorted(kb_clauses, key=len):
+        clause = simplify(clause)
+        if not clause:
+            return True
+        if not subsumed(clause):
+            keep(clause)
+    support, seen = [], set()
+    for c in conjuncts(to_cnf(~alpha)):
+        lits = clause_to_ints(c, number)
+        if lits is not None:
+            heapq.heappush(support, (len(lits), frozenset(lits)))
+    while support:
+        _, given = heapq.heappop(support)
+        given = simplify(given)
+        if not given:
+            return True
+        if subsumed(given):
+            continue
+        keep(given)
+        for lit in given:
+            for other in occurs.get(-lit, ()):
+                resolvent = simplify((given - set([lit])) | (other - set([-lit])))
+                if resolvent in seen:
+                    continue
+                seen.add(resolvent)
+                if [l for l in resolvent if -l in resolvent]:
+                    continue
+                if not resolvent:
+                    return True
+                if not subsumed(resolvent):
+                    heapq.heappush(support, (len(resolvent), resolvent))
+    return False
 
 def pl_resolve(ci, cj):
     """Return all clauses that can be obtained by resolving clauses ci and cj.
@@ -609,46 +669,87 @@ def pl_resolve(ci, cj):
 #______________________________________________________________________________
 
 class PropDefiniteKB(PropKB):
-    "A KB of propositional definite clauses."
+    """A KB of propositional definite clauses.
+    Each rule is indexed under the symbols of its premise, with a count of
+    the premise symbols not yet inferred, so forward chaining is linear in
+    the size of the KB.  The counts, the symbols inferred and the agenda
+    are kept between queries: telling a fact or rule extends the previous
+    fixpoint instead of restarting it (retracting does restart it).
+    >>> kb = PropDefiniteKB()
+    >>> for s in ['A', '(A & B) >> C', 'C >> D']: kb.tell(expr(s))
+    >>> kb.ask(expr('D')), kb.ask(expr('C'))
+    (False, False)
+    >>> kb.tell(expr('B'))
+    >>> kb.ask(expr('D'))
+    {}
+    >>> kb.retract(expr('A'))
+    >>> kb.ask(expr('C'))
+    False
+    """
+
+    def __init__(self, sentence=None):
+        self.premise_index = {} # symbol -> rules with it in their premise
+        self.count = {}         # rule -> number of premise symbols not inferred
+        self.inferred = set()   # symbols taken off the agenda
+        self.agenda = []        # symbols known true, not yet propagated
+        PropKB.__init__(self, sentence)
 
     def tell(self, sentence):
         "Add a definite clause to this KB."
         assert is_definite_clause(sentence), "Must be definite clause"
         self.clauses.append(sentence)
+        if sentence.op != '>>':
+            self.agenda.append(sentence)
+        elif sentence not in self.count:
+            premises = set(conjuncts(sentence.args[0]))
+            for p in premises:
+                self.premise_index.setdefault(p, []).append(sentence)
+            self.count[sentence] = len(premises - self.inferred)
+            if not self.count[sentence]:
+                self.agenda.append(sentence.args[1])
 
     def ask_generator(self, query):
         "Yield the empty substitution if KB implies query; else nothing."
-        if pl_fc_entails(self.clauses, query):
+        if pl_fc_entails(self, query):
             yield {}
 
     def retract(self, sentence):
         self.clauses.remove(sentence)
+        if sentence.op == '>>' and sentence not in self.clauses:
+            for p in set(conjuncts(sentence.args[0])):
+                self.premise_index[p].remove(sentence)
+            del self.count[sentence]
+        self.restart()
+
+    def restart(self):
+        "Forget everything inferred; start again from the facts."
+        self.inferred = set()
+        self.agenda = [c for c in self.clauses if c.op != '>>']
+        for c in self.count:
+            self.count[c] = len(set(conjuncts(c.args[0])))
 
     def clauses_with_premise(self, p):
-        """Return a list of the clauses in KB that have p in their premise.
-        This could be cached away for O(1) speed, but we'll recompute it."""
-        return [c for c in self.clauses
-                if c.op == '>>' and p in conjuncts(c.args[0])]
+        "Return a list of the clauses in KB that have p in their premise."
+        return self.premise_index.get(p, [])
 
 def pl_fc_entails(KB, q):
     """Use forward chaining to see if a PropDefiniteKB entails symbol q.
-    [Fig. 7.15]
+    [Fig. 7.15]  The count, inferred and agenda of the figure are kept in
+    the KB, so each call carries on from where the previous one stopped.
     >>> pl_fc_entails(Fig[7,15], expr('Q'))
     True
     """
-    count = dict([(c, len(conjuncts(c.args[0]))) for c in KB.clauses
-                                                 if c.op == '>>'])
-    inferred = DefaultDict(False)
-    agenda = [s for s in KB.clauses if is_prop_symbol(s.op)]
+    count, inferred, agenda = KB.count, KB.inferred, KB.agenda
+    if q in inferred: return True
     while agenda:
         p = agenda.pop()
-        if p == q: return True
-        if not inferred[p]:
-            inferred[p] = True
+        if p not in inferred:
+            inferred.add(p)
             for c in KB.clauses_with_premise(p):
                 count[c] -= 1
                 if count[c] == 0:
                     agenda.append(c.args[1])
+        if p == q: return True
     return False
 
 ## Wumpus World example [Fig. 7.13]
@@ -666,20 +767,299 @@ def dpll_satisfiable(s):
     """Check satisfiability of a propositional sentence.
     This differs from the book code in two ways: (1) it returns a model
     rather than True when it succeeds; this is more useful. (2) The
-    function find_pure_symbol is passed a list of unknown clauses, rather
-    than a list of all clauses and the model; this is more efficient.
+    search is done by DPLLSolver, an iterative DPLL over integer clauses
+    with watched literals, rather than by the recursive dpll below.
     >>> ppsubst(dpll_satisfiable(A&~B))
     {A: True, B: False}
     >>> dpll_satisfiable(P&~P)
     False
+    >>> ppsubst(dpll_satisfiable((A|B) & (~A|C) & (~B|C) & (~C|~A)))
+    {A: False, B: True, C: True}
     """
-    clauses = conjuncts(to_cnf(s))
-    symbols = prop_symbols(s)
+    solver = DPLLSolver(conjuncts(to_cnf(s)))
+    if solver.solve():
+        return solver.model()
+    return False
 
-    print '  >>> Got clauses (',len(clauses),') and symbols (', len(symbols), ')'
-    print '  >>> starting dpll proper'
-    
-    return dpll(clauses, symbols, {})
+def clause_to_ints(clause, number):
+    """The literals of a CNF clause as non-zero ints, DIMACS style:
+    number(P) is the int for symbol P, and -number(P) the int for ~P.
+    Repeated literals are removed; a tautology gives None.
+    >>> clause_to_ints(A | ~B | A, {A: 1, B: 2}.get)
+    [1, -2]
+    >>> clause_to_ints(A | ~B | ~A, {A: 1, B: 2}.get)
+    """
+    lits = []
+    for literal in disjuncts(clause):
+        if literal.op == '~':
+            sym, sign = literal.args[0], -1
+        else:
+            sym, sign = literal, 1
+        if sym.op in ('TRUE', 'FALSE'):
+            if (sym.op == 'TRUE') == (sign == 1):
+                return None
+            continue
+        lit = sign * number(sym)
+        if -lit in lits:
+            return None
+        if lit not in lits:
+            lits.append(lit)
+    return lits
+
+def clauses_to_ints(clauses):
+    """Number the symbols of a list of CNF clauses, in order of appearance,
+    and return (int_clauses, symbols), where symbols[v] is the symbol
+    numbered v (symbols[0] is unused).  Tautologies are dropped.
+    >>> clauses_to_ints([A|~B, B|~B, ~A, C|C])
+    ([[1, -2], [-1], [3]], [None, A, B, C])
+    """
+    index, symbols = {}, [None]
+    def number(sym):
+        if sym not in index:
+            index[sym] = len(symbols)
+            symbols.append(sym)
+        return index[sym]
+    int_clauses = []
+    for clause in clauses:
+        lits = clause_to_ints(clause, number)
+        if lits is not None:
+            int_clauses.append(lits)
+    return int_clauses, symbols
+
+class DPLLSolver(object):
+    """An iterative DPLL solver.  Clauses are lists of int literals (see
+    clause_to_ints).  Unit propagation uses two watched literals per
+    clause; assignments go on a trail, undone by chronological
+    backtracking.  Each literal has an occurrence list, and a count of the
+    not yet satisfied clauses it occurs in, so pure literals are found as
+    those counts drop to zero; the search stops as soon as every clause
+    has a true literal (the model may then leave some symbols unassigned).
+
+    Clauses can be added between calls to solve, and solve can be given
+    assumptions: literals that hold for that call only.
+    >>> solver = DPLLSolver([A | B, ~A | B])
+    >>> solver.solve(), solver.model()[B]
+    (True, True)
+    >>> solver.solve([~B])
+    False
+    >>> solver.add_clause(~B)
+    False
+    >>> solver.solve()
+    False
+    """
+
+    def __init__(self, clauses=()):
+        self.index = {}        # symbol -> var number
+        self.symbols = [None]  # var number -> symbol
+        self.clauses = []      # int clauses; the first two literals are watched
+        self.watches = {}      # literal -> clauses watching it
+        self.occurs = {}       # literal -> clauses it occurs in
+        self.active = {}       # literal -> number of unsatisfied clauses it occurs in
+        self.value = {}        # literal -> 1 (true), -1 (false) or 0 (unassigned)
+        self.sat = []          # clause -> number of true literals
+        self.unsat = 0         # number of clauses without a true literal
+        self.trail = []        # assigned literals, in order
+        self.head = 0          # trail[head:] is still to be propagated
+        self.decisions = []    # [trail position, literal, flipped] per level
+        self.pure = []         # candidate pure literals
+        self.next_var = 1      # no var below this is unassigned
+        self.ok = True         # False once the clauses are known unsatisfiable
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def var(self, symbol):
+        "The number of symbol, allocating a new variable the first time."
+        v = self.index.get(symbol)
+        if v is None:
+            v = self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            for lit in (v, -v):
+                self.watches[lit], self.occurs[lit] = [], []
+                self.active[lit] = self.value[lit] = 0
+        return v
+
+    def literal(self, literal):
+        "The int for a literal such as P or ~P."
+        if literal.op == '~':
+            return -self.var(literal.args[0])
+        return self.var(literal)
+
+    def add_clause(self, clause):
+        """Add a CNF clause.  Return False if the clauses have become
+        unsatisfiable (without search: by unit propagation alone)."""
+        lits = clause_to_ints(clause, self.var)
+        if lits is None:
+            return self.ok
+        return self.add_int_clause(lits)
+
+    def add_int_clause(self, lits):
+        self.cancel_until(0)
+        if not self.ok:
+            return False
+        value = self.value
+        # Assignments made outside of any decision are permanent, so the
+        # clause can be simplified by them.
+        if [l for l in lits if value[l] == 1]:
+            return True
+        lits = [l for l in lits if value[l] == 0]
+        if len(lits) <= 1:
+            if not lits or not self.assign(lits[0]) or not self.propagate():
+                self.ok = False
+            return self.ok
+        c = len(self.clauses)
+        self.clauses.append(lits)
+        self.sat.append(0)
+        self.unsat += 1
+        for l in lits:
+            self.occurs[l].append(c)
+            self.active[l] += 1
+        self.watches[lits[0]].append(c)
+        self.watches[lits[1]].append(c)
+        return True
+
+    def assign(self, lit):
+        value, active = self.value, self.active
+        value[lit], value[-lit] = 1, -1
+        self.trail.append(lit)
+        for c in self.occurs[lit]:
+            self.sat[c] += 1
+            if self.sat[c] == 1:
+                self.unsat -= 1
+                for l in self.clauses[c]:
+                    active[l] -= 1
+                    if not active[l]:
+                        self.pure.append(-l)
+        return True
+
+    def unassign(self, lit):
+        value, active = self.value, self.active
+        value[lit] = value[-lit] = 0
+        for c in self.occurs[lit]:
+            self.sat[c] -= 1
+            if not self.sat[c]:
+                self.unsat += 1
+                for l in self.clauses[c]:
+                    active[l] += 1
+
+    def propagate(self):
+        "Unit propagation; return False on a conflict."
+        value, clauses, watches, trail = self.value, self.clauses, self.watches, self.trail
+        while self.head < len(trail):
+            false_lit = -trail[self.head]
+            self.head += 1
+            ws = watches[false_lit]
+            i = 0
+            while i < len(ws):
+                c = ws[i]
+                clause = clauses[c]
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                other = clause[0]
+                if value[other] == 1:
+                    i += 1
+                    continue
+                for k in xrange(2, len(clause)):
+                    if value[clause[k]] != -1: # watch this literal instead
+                        clause[1], clause[k] = clause[k], false_lit
+                        watches[clause[1]].append(c)
+                        ws[i] = ws[-1]
+                        ws.pop()
+                        break
+                else:
+                    if value[other] == -1:
+                        return False
+                    self.assign(other)
+                    i += 1
+        return True
+
+    def cancel_until(self, level):
+        "Undo every assignment made after the first <level> decisions."
+        if len(self.decisions) <= level:
+            return
+        pos = self.decisions[level][0]
+        trail = self.trail
+        while len(trail) > pos:
+            lit = trail.pop()
+            self.unassign(lit)
+            self.next_var = min(self.next_var, abs(lit))
+        del self.decisions[level:]
+        self.head = pos
+
+    def decide(self, lit, flipped):
+        self.decisions.append([len(self.trail), lit, flipped])
+        self.assign(lit)
+
+    def backtrack(self):
+        """Undo levels up to the most recent decision that has not been
+        flipped, and flip it.  Return False if there is none."""
+        while self.decisions:
+            pos, lit, flipped = self.decisions[-1]
+            self.cancel_until(len(self.decisions) - 1)
+            if not flipped:
+                self.decide(-lit, True)
+                return True
+        return False
+
+    def pick_pure(self):
+        value, active = self.value, self.active
+        while self.pure:
+            lit = self.pure.pop()
+            if not value[lit] and not active[-lit] and active[lit]:
+                return lit
+        return None
+
+    def pick_branch(self):
+        value, active = self.value, self.active
+        v = self.next_var
+        while value[v]:
+            v += 1
+        self.next_var = v
+        if active[v] >= active[-v]:
+            return v
+        return -v
+
+    def solve(self, assumptions=()):
+        """Return True if the clauses, together with the assumptions (a
+        list of literals such as P or ~P), are satisfiable.  After True,
+        model() gives the satisfying assignment."""
+        self.cancel_until(0)
+        if not self.ok or not self.propagate():
+            self.ok = False
+            return False
+        # A root level: pure literals do not follow from the clauses, so
+        # they must be undone before clauses are added or solve is called
+        # again.  The assumptions are levels that are never flipped.
+        self.decide_root()
+        for literal in assumptions:
+            lit = self.literal(literal)
+            if self.value[lit] == -1:
+                return False
+            if not self.value[lit]:
+                self.decide(lit, True)
+                if not self.propagate():
+                    return False
+        while True:
+            if not self.propagate():
+                if not self.backtrack():
+                    return False
+                continue
+            if not self.unsat:
+                return True
+            lit = self.pick_pure()
+            if lit is not None:
+                self.assign(lit)
+            else:
+                self.decide(self.pick_branch(), False)
+
+    def decide_root(self):
+        self.decisions.append([len(self.trail), None, True])
+        self.pure = [lit for lit in self.active
+                     if not self.active[lit] and self.active[-lit]]
+
+    def model(self):
+        "The assignment found by the last successful solve, as {symbol: value}."
+        symbols = self.symbols
+        return dict((symbols[abs(lit)], lit > 0) for lit in self.trail)
 
 def dpll(clauses, symbols, model):
     "See if the clauses are true in a partial model."
@@ -758,24 +1138,91 @@ def literal_symbol(literal):
 #______________________________________________________________________________
 # Walk-SAT [Fig. 7.18]
 
-def WalkSAT(clauses, p=0.5, max_flips=10000):
-    ## model is a random assignment of true/false to the symbols in clauses
-    ## See ~/aima1e/print1/manual/knowledge+logic-answers.tex ???
-    model = dict([(s, random.choice([True, False]))
-                 for s in prop_symbols(clauses)])
-    for i in range(max_flips):
-        satisfied, unsatisfied = [], []
-        for clause in clauses:
-            if_(pl_true(clause, model), satisfied, unsatisfied).append(clause)
-        if not unsatisfied: ## if model satisfies all the clauses
-            return model
-        clause = random.choice(unsatisfied)
-        if probability(p):
-            sym = random.choice(prop_symbols(clause))
-        else:
-            ## Flip the symbol in clause that maximizes number of sat. clauses
-            raise NotImplementedError
-        model[sym] = not model[sym]
+def WalkSAT(clauses, p=0.5, max_flips=10000, max_tries=1, model=None):
+    """Look for a model of a list of CNF clauses by local search: start from
+    a random assignment (taking the values of model for the symbols it
+    assigns, if given), and repeatedly flip a symbol of a random
+    unsatisfied clause: with probability p a random one, otherwise the one
+    that satisfies the most clauses.  Give up after max_flips flips,
+    restarting from a fresh random assignment up to max_tries times in all.
+    Return a model, or None if none was found.
+
+    Clauses are translated to integers.  Each clause keeps its number of
+    true literals (and the sum of their variables, which is the variable of
+    the only true literal when there is one); each variable keeps how many
+    unsatisfied clauses flipping it would make true, and how many clauses
+    it would break.  A flip then only touches the clauses it appears in.
+    >>> ppsubst(WalkSAT([A|B, ~A|C, ~B|C, ~C|~A]))
+    {A: False, B: True, C: True}
+    >>> WalkSAT([A, ~A], max_flips=100)
+    """
+    int_clauses, symbols = clauses_to_ints(clauses)
+    if [] in int_clauses:
+        return None
+    n, m = len(symbols), len(int_clauses)
+    pos = [[] for v in range(n)]  # clauses in which v occurs positively
+    neg = [[] for v in range(n)]  # ... and negatively
+    for c, clause in enumerate(int_clauses):
+        for lit in clause:
+            if lit > 0: pos[lit].append(c)
+            else: neg[-lit].append(c)
+    for attempt in range(max_tries):
+        value = [None] + [random.choice([True, False]) for v in range(1, n)]
+        if model and attempt == 0:
+            for v in range(1, n):
+                value[v] = model.get(symbols[v], value[v])
+        numtrue, sumtrue, where = [0] * m, [0] * m, [None] * m
+        make, brk, unsat = [0] * n, [0] * n, []
+        for c, clause in enumerate(int_clauses):
+            for lit in clause:
+                if value[abs(lit)] == (lit > 0):
+                    numtrue[c] += 1
+                    sumtrue[c] += abs(lit)
+            if numtrue[c] == 0:
+                where[c] = len(unsat)
+                unsat.append(c)
+                for lit in clause: make[abs(lit)] += 1
+            elif numtrue[c] == 1:
+                brk[sumtrue[c]] += 1
+        for i in xrange(max_flips):
+            if not unsat:
+                break
+            clause = int_clauses[random.choice(unsat)]
+            if probability(p):
+                v = abs(random.choice(clause))
+            else:
+                v = argmax_random_tie([abs(lit) for lit in clause],
+                                      lambda v: make[v] - brk[v])
+            value[v] = not value[v]
+            if value[v]:
+                now_true, now_false = pos[v], neg[v]
+            else:
+                now_true, now_false = neg[v], pos[v]
+            for c in now_true:
+                numtrue[c] += 1
+                sumtrue[c] += v
+                if numtrue[c] == 1:
+                    last = unsat.pop()
+                    if last != c:
+                        unsat[where[c]] = last
+                        where[last] = where[c]
+                    for lit in int_clauses[c]: make[abs(lit)] -= 1
+                    brk[v] += 1
+                elif numtrue[c] == 2:
+                    brk[sumtrue[c] - v] -= 1
+            for c in now_false:
+                numtrue[c] -= 1
+                sumtrue[c] -= v
+                if numtrue[c] == 0:
+                    where[c] = len(unsat)
+                    unsat.append(c)
+                    for lit in int_clauses[c]: make[abs(lit)] += 1
+                    brk[v] -= 1
+                elif numtrue[c] == 1:
+                    brk[sumtrue[c]] += 1
+        if not unsat:
+            return dict((symbols[v], value[v]) for v in range(1, n))
+    return None
 
 #______________________________________________________________________________
 
@@ -793,8 +1240,23 @@ def plan_route(current, goals, allowed):
 
 def SAT_plan(init, transition, goal, t_max, SAT_solver=None # CTM: dpll_satisfiable
              ):
-    "[Fig. 7.22]"
-    for t in range(t_max):
+    """[Fig. 7.22] A shortest plan (list of actions) of at most t_max steps
+    from state init to goal (a state, or a list of states), or None.
+    transition[s][a] is the state that action a leads to from state s.
+    With no SAT_solver, one incremental SATPlanner serves every horizon;
+    otherwise each horizon is translated and solved from scratch.
+    >>> transition = {'A': {'Left': 'A', 'Right': 'B'},
+    ...               'B': {'Left': 'A', 'Right': 'C'},
+    ...               'C': {'Left': 'B', 'Right': 'C'}}
+    >>> SAT_plan('A', transition, 'C', 2)
+    ['Right', 'Right']
+    >>> SAT_plan('A', transition, 'C', 1)
+    >>> SAT_plan('C', transition, ['A'], 3, dpll_satisfiable)
+    ['Left', 'Left']
+    """
+    if SAT_solver is None:
+        return SATPlanner(*transition_problem(init, transition, goal)).plan(t_max)
+    for t in range(t_max + 1):
         cnf = translate_to_SAT(init, transition, goal, t)
         model = SAT_solver(cnf)
         if model is not False:
@@ -802,10 +1264,103 @@ def SAT_plan(init, transition, goal, t_max, SAT_solver=None # CTM: dpll_satisfia
     return None
 
 def translate_to_SAT(init, transition, goal, t):
-    unimplemented()
+    """The sentence whose models are the plans of exactly t steps.  The
+    state s at time t is the symbol At(s, t), action a at time t is Do(a, t).
+    >>> translate_to_SAT('A', {'A': {'Go': 'B'}}, 'B', 0)
+    (At(A, 0) & ~At(B, 0) & At(B, 0))
+    """
+    init_clauses, layer, goal_at, actions = transition_problem(init, transition, goal)
+    clauses = list(init_clauses)
+    for i in range(t):
+        clauses.extend(layer(i))
+    clauses.append(associate('|', goal_at(t)))
+    return associate('&', clauses)
 
 def extract_solution(model):
-    unimplemented()
+    "The actions Do(a, t) true in model, in order of t."
+    steps = sorted((lit.args[1].op, lit.args[0].op)
+                   for lit, value in model.items() if value and lit.op == 'Do')
+    return [action for t, action in steps]
+
+def at_most_one(literals):
+    "Pairwise clauses saying that at most one of the literals is true."
+    return [~a | ~b for a, b in itertools.combinations(literals, 2)]
+
+def transition_problem(init, transition, goal):
+    """The problem of reaching goal from init under transition, as the
+    (init_clauses, layer, goal, actions) that SATPlanner takes.  In each step
+    exactly one action applicable in the current state is done, and the
+    agent is then in exactly one state: the one the action leads to.
+    Implied clauses (a state is only entered from one of its predecessors)
+    let unit propagation rule out the states that cannot reach the goal."""
+    goals = goal if isinstance(goal, list) else [goal]
+    states = set(transition)
+    for s in transition:
+        states.update(transition[s].values())
+    states = sorted(states)
+    names = sorted(set(a for s in transition for a in transition[s]))
+    At = lambda s, t: Expr('At', s, t)
+    Do = lambda a, t: Expr('Do', a, t)
+    init_clauses = [At(s, 0) if s == init else ~At(s, 0) for s in states]
+    predecessors = dict((s, set()) for s in states)
+    for s in transition:
+        for s1 in transition[s].values():
+            predecessors[s1].add(s)
+    def layer(t):
+        clauses = [associate('|', [Do(a, t) for a in names])]
+        clauses.extend(at_most_one([Do(a, t) for a in names]))
+        for a in names:
+            clauses.append(associate('|', [~Do(a, t)] + [At(s, t) for s in transition
+                                                         if a in transition[s]]))
+        for s in transition:
+            for a, s1 in transition[s].items():
+                clauses.append(~At(s, t) | ~Do(a, t) | At(s1, t + 1))
+        for s1 in states:
+            clauses.append(associate('|', [~At(s1, t + 1)] + [At(s, t) for s in
+                                                            sorted(predecessors[s1])]))
+        clauses.extend(at_most_one([At(s, t + 1) for s in states]))
+        return clauses
+    goal_at = lambda t: [At(g, t) for g in goals]
+    actions = lambda t: [(Do(a, t), a) for a in names]
+    return init_clauses, layer, goal_at, actions
+
+class SATPlanner(object):
+    """SATPlan [Fig. 7.22] over a single incremental DPLLSolver.  The
+    problem is given by functions of the time step:
+        init_clauses  the CNF clauses that hold at time 0
+        layer(t)      the clauses for the step from time t to t+1
+        goal(t)       literals, one of which holds when the goal is reached at t
+        actions(t)    (symbol, action) pairs for the actions at time t
+    Each horizon adds only its new layer to the solver.  The goal is not
+    asserted: the clause ~Goal(t) | goal(t) is added, and the auxiliary
+    symbol Goal(t) is passed to solve as an assumption, so the clauses of
+    a failed horizon remain valid for the next."""
+
+    def __init__(self, init_clauses, layer, goal, actions, solver=None):
+        self.solver = solver or DPLLSolver()
+        self.layer, self.goal, self.actions = layer, goal, actions
+        self.horizon = 0    # layers 0..horizon-1 have been added
+        for clause in init_clauses:
+            self.solver.add_clause(clause)
+
+    def extend(self):
+        "Add the layer from the current horizon to the next."
+        for clause in self.layer(self.horizon):
+            self.solver.add_clause(clause)
+        self.horizon += 1
+
+    def plan(self, t_max):
+        "A shortest plan of at most t_max steps, or None."
+        for t in range(t_max + 1):
+            while self.horizon < t:
+                self.extend()
+            goal = Expr('Goal', t)
+            self.solver.add_clause(associate('|', [~goal] + self.goal(t)))
+            if self.solver.solve([goal]):
+                model = self.solver.model()
+                return [action for i in range(t)
+                        for symbol, action in self.actions(i) if model.get(symbol)]
+        return None
 
 #______________________________________________________________________________
 
@@ -834,6 +1389,128 @@ def unify(x, y, s):
     else:
         return None
 
+class BindingStore(object):
+    """Variable bindings for unification, kept in one mutable dict rather
+    than copied on every binding.  The substitution is triangular: a
+    variable may be bound to a term containing other bound variables, and
+    is dereferenced when it is looked at.  Every binding is recorded on a
+    trail, so that backtracking undoes the bindings made since a mark.
+    Unification and the occurs check use explicit stacks, not recursion.
+    >>> store = BindingStore()
+    >>> store.unify(x + y, y + C)
+    True
+    >>> store.resolve(x + y)
+    (C + C)
+    >>> m = store.mark()
+    >>> store.unify(F(z), F(F(z)))
+    False
+    >>> store.unify(F(z), F(A)), store.resolve(z)
+    (True, A)
+    >>> store.undo(m); store.resolve(F(z))
+    F(z)
+    """
+
+    def __init__(self):
+        self.bindings = {} # variable name -> term
+        self.trail = []    # variable names, in the order they were bound
+
+    def mark(self):
+        return len(self.trail)
+
+    def undo(self, mark):
+        "Remove the bindings made since mark."
+        trail, bindings = self.trail, self.bindings
+        while len(trail) > mark:
+            del bindings[trail.pop()]
+
+    def deref(self, x):
+        "Follow the bindings of x, if it is a bound variable."
+        bindings = self.bindings
+        while isinstance(x, Expr) and not x.args and x.op in bindings:
+            x = bindings[x.op]
+        return x
+
+    def shallow(self, x):
+        "x with the variables among its arguments dereferenced."
+        if isinstance(x, Expr) and x.args:
+            return Expr(x.op, *[self.deref(a) for a in x.args])
+        return x
+
+    def bind(self, var, x):
+        self.bindings[var.op] = x
+        self.trail.append(var.op)
+
+    def unify(self, x, y):
+        """Extend the bindings so that x and y are equal, and return True;
+        or, if they can not be unified, leave the bindings alone and
+        return False."""
+        mark = len(self.trail)
+        stack = [(x, y)]
+        while stack:
+            x, y = stack.pop()
+            x, y = self.deref(x), self.deref(y)
+            if x is y:
+                continue
+            if is_variable(x):
+                if x == y:
+                    continue
+                if self.occurs(x, y):
+                    break
+                self.bind(x, y)
+            elif is_variable(y):
+                if self.occurs(y, x):
+                    break
+                self.bind(y, x)
+            elif isinstance(x, Expr) and isinstance(y, Expr):
+                if x.op != y.op or len(x.args) != len(y.args):
+                    break
+                stack.extend(zip(x.args, y.args))
+            elif isinstance(x, str) or isinstance(y, str):
+                if x != y:
+                    break
+            elif issequence(x) and issequence(y) and len(x) == len(y):
+                stack.extend(zip(x, y))
+            elif x != y:
+                break
+        else:
+            return True
+        self.undo(mark)
+        return False
+
+    def occurs(self, var, x):
+        "Does var occur in x, given the bindings?"
+        stack = [x]
+        while stack:
+            x = self.deref(stack.pop())
+            if var == x:
+                return True
+            elif isinstance(x, Expr):
+                stack.extend(x.args)
+            elif isinstance(x, (list, tuple)):
+                stack.extend(x)
+        return False
+
+    def resolve(self, x):
+        "x with all the bindings applied."
+        x = self.deref(x)
+        if not isinstance(x, Expr) or not x.args:
+            return x
+        stack = [(x, [])] # (Expr, its arguments resolved so far)
+        while True:
+            node, args = stack[-1]
+            if len(args) < len(node.args):
+                arg = self.deref(node.args[len(args)])
+                if isinstance(arg, Expr) and arg.args:
+                    stack.append((arg, []))
+                else:
+                    args.append(arg)
+            else:
+                stack.pop()
+                result = Expr(node.op, *args)
+                if not stack:
+                    return result
+                stack[-1][1].append(result)
+
 def is_variable(x):
     "A variable is an Expr with no args and a lowercase symbol as the op."
     return isinstance(x, Expr) and not x.args and is_var_symbol(x.op)
@@ -888,13 +1565,143 @@ def subst(s, x):
         return Expr(x.op, *[subst(s, arg) for arg in x.args])
 
 def fol_fc_ask(KB, alpha):
-    """Inefficient forward chaining for first-order logic. [Fig. 9.3]
-    KB is a FolKB and alpha must be an atomic sentence."""
-    while True:
-        new = {}
-        for r in KB.clauses:
-            ps, q = parse_definite_clause(standardize_variables(r))
-            raise NotImplementedError
+    """Forward chaining for first-order logic. [Fig. 9.3]
+    KB is a FolKB and alpha must be an atomic sentence.  Generate a
+    substitution for each fact, told or derived, that unifies with alpha,
+    as soon as it is found.  The rules are compiled into a ReteNetwork,
+    so each fact only costs the matches it takes part in.
+    >>> for theta in fol_fc_ask(crime_kb, expr('Criminal(x)')): ppsubst(theta)
+    {x: West}
+    """
+    rules = [c for c in KB.clauses if parse_definite_clause(c)[0]]
+    facts = [c for c in KB.clauses if not parse_definite_clause(c)[0]]
+    net = ReteNetwork(rules)
+    for fact in facts:
+        for new in net.tell(fact):
+            theta = unify(alpha, new, {})
+            if theta is not None:
+                yield theta
+
+class ReteNetwork(object):
+    """A forward chainer for first-order definite clauses, compiled into a
+    discrimination network.  Each distinct premise pattern has an alpha
+    memory of the facts that match it; each rule has a beta memory per
+    premise, of the substitutions that satisfy the premises before it.  A
+    new fact is joined only with the beta memories of the patterns it
+    matches, and the substitutions that survive are joined with the facts
+    of the later premises; the conclusions reached become new facts in
+    turn.  Both sides of each join are hashed on the values of the
+    variables the premise shares with the premises before it, so a join
+    only meets the entries it can unify with.  Facts are expected to be
+    ground.
+    >>> net = ReteNetwork(map(expr, ['Parent(Al, Bo)',
+    ...                   '(Parent(x, y) & Parent(y, z)) ==> Grandparent(x, z)']))
+    >>> list(net.tell(expr('Parent(Bo, Cy)')))
+    [Parent(Bo, Cy), Grandparent(Al, Cy)]
+    >>> list(net.tell(expr('Parent(Bo, Cy)')))
+    []
+    >>> list(net.tell(expr('Parent(Di, Di)')))
+    [Parent(Di, Di), Grandparent(Di, Di)]
+    """
+
+    def __init__(self, clauses=()):
+        self.alphas = {}       # variant_key(pattern) -> alpha memory
+        self.by_predicate = {} # (predicate, arity) -> alpha memories
+        self.facts = {}        # (predicate, arity) -> facts
+        self.known = set()
+        self.agenda = collections.deque() # conclusions not yet added
+        for clause in clauses:
+            for fact in self.tell(clause):
+                pass
+
+    def tell(self, sentence):
+        """Add a definite clause, and generate every fact that is new to the
+        network as a result: the sentence itself if it is a new fact, then
+        what follows from it.  The derivation goes on as the generator is
+        consumed; whatever is left is carried on by the next tell."""
+        premises, conclusion = parse_definite_clause(sentence)
+        if premises:
+            self.add_rule(sentence)
+        else:
+            self.agenda.appendleft(sentence)
+        while self.agenda:
+            fact = self.agenda.popleft()
+            if fact not in self.known:
+                self.add_fact(fact)
+                yield fact
+
+    def add_fact(self, fact):
+        self.known.add(fact)
+        key = (fact.op, len(fact.args))
+        self.facts.setdefault(key, []).append(fact)
+        for alpha in self.by_predicate.get(key, ()):
+            if unify(alpha.pattern, fact, {}) is None:
+                continue
+            alpha.facts.append(fact)
+            # Later premises first: a fact that matches two premises of a
+            # rule is then joined with itself only once.
+            for rule, i in alpha.successors:
+                jkey = rule.store_fact(i, fact)
+                for theta in rule.beta[i].get(jkey, ()):
+                    theta1 = unify(rule.premises[i], fact, theta)
+                    if theta1 is not None:
+                        self.activate(rule, i + 1, theta1)
+
+    def add_rule(self, rule):
+        r = ReteRule(*parse_definite_clause(standardize_variables(rule)))
+        for i, pattern in enumerate(r.premises):
+            alpha = self.alpha_memory(pattern)
+            alpha.successors.append((r, i))
+            alpha.successors.sort(key=lambda (rule, i): -i)
+            for fact in alpha.facts:
+                r.store_fact(i, fact)
+        self.activate(r, 0, {})
+
+    def alpha_memory(self, pattern):
+        key = variant_key(pattern)
+        if key not in self.alphas:
+            pkey = (pattern.op, len(pattern.args))
+            self.alphas[key] = alpha = Struct(pattern=pattern, successors=[],
+                facts=[f for f in self.facts.get(pkey, ())
+                       if unify(pattern, f, {}) is not None])
+            self.by_predicate.setdefault(pkey, []).append(alpha)
+        return self.alphas[key]
+
+    def activate(self, rule, level, theta):
+        "theta satisfies the first <level> premises of rule: pass it on."
+        if level == len(rule.premises):
+            self.agenda.append(subst(theta, rule.conclusion))
+            return
+        jkey = tuple([theta[v] for v in rule.join_vars[level]])
+        rule.beta[level].setdefault(jkey, []).append(theta)
+        pattern = rule.premises[level]
+        for fact in rule.right[level].get(jkey, ()):
+            theta1 = unify(pattern, fact, theta)
+            if theta1 is not None:
+                self.activate(rule, level + 1, theta1)
+
+class ReteRule(object):
+    """The join nodes of one rule in a ReteNetwork.  For each premise i:
+    join_vars[i] are its variables that occur in earlier premises;
+    beta[i] holds the substitutions satisfying premises[:i], and right[i]
+    the facts matching premises[i], both hashed on the join_vars[i] values."""
+
+    def __init__(self, premises, conclusion):
+        self.premises, self.conclusion = premises, conclusion
+        self.join_vars, seen = [], set()
+        for p in premises:
+            pvars = variables(p)
+            self.join_vars.append(sorted(pvars & seen, key=repr))
+            seen |= pvars
+        self.beta = [{} for p in premises]
+        self.right = [{} for p in premises]
+
+    def store_fact(self, i, fact):
+        "Add fact, which matches premises[i], to right[i]; return its key."
+        phi = unify(self.premises[i], fact, {})
+        jkey = tuple([phi[v] for v in self.join_vars[i]])
+        self.right[i].setdefault(jkey, []).append(fact)
+        return jkey
 
 def standardize_variables(sentence, dic=None):
     """Replace all the variables in sentence with new variables.
@@ -934,31 +1741,84 @@ class FolKB(KB):
     Flopsie
     >>> kb0.ask(expr('Wife(Pete, x)'))
     False
+
+    Clauses are indexed by the predicate and arity of their conclusion,
+    and (if first_arg_index) by its first argument when that is a
+    constant, so fetch_rules_for_goal only returns clauses whose
+    conclusion could unify with the goal, in the order they were told.
+    >>> [str(c) for c in kb0.fetch_rules_for_goal(expr('Rabbit(Flopsie)'))]
+    ['Rabbit(Flopsie)']
+
+    Facts and rules without arguments are only indexed by predicate:
+    >>> FolKB([expr('Rains'), expr('Rains ==> Wet')]).ask(expr('Wet'))
+    {}
+
+    With tabled=True, ask uses fol_bc_ask_tabled.
     """
-    def __init__(self, initial_clauses=[]):
-        self.clauses = [] # inefficient: no indexing
+    def __init__(self, initial_clauses=[], first_arg_index=True, tabled=False):
+        self.clauses = []
+        self.first_arg_index = first_arg_index
+        self.tabled = tabled
+        self.index = {}  # (predicate, arity) -> [(n, clause)]
+        self.by_first = {} # (predicate, arity, first arg or None) -> [(n, clause)]
+        self.told = itertools.count() # n: the order clauses were told in
         for clause in initial_clauses:
             self.tell(clause)
 
     def tell(self, sentence):
         if is_definite_clause(sentence):
             self.clauses.append(sentence)
+            entry = (self.told.next(), sentence)
+            for key in self.index_keys(sentence):
+                index = self.by_first if len(key) == 3 else self.index
+                index.setdefault(key, []).append(entry)
         else:
             raise Exception("Not a definite clause: %s" % sentence)
 
     def ask_generator(self, query):
+        if self.tabled:
+            return fol_bc_ask_tabled(self, query)
         return fol_bc_ask(self, query)
 
     def retract(self, sentence):
         self.clauses.remove(sentence)
+        for key in self.index_keys(sentence):
+            entries = (self.by_first if len(key) == 3 else self.index)[key]
+            for i, (n, c) in enumerate(entries):
+                if c == sentence:
+                    del entries[i]
+                    break
+
+    def index_keys(self, clause):
+        "The index entries for clause: (predicate, arity) and maybe a first argument."
+        head = parse_definite_clause(clause)[1]
+        key = (head.op, len(head.args))
+        if not self.first_arg_index or not head.args:
+            return [key]
+        return [key, key + (constant_arg(head.args[0]),)]
 
     def fetch_rules_for_goal(self, goal):
-        return self.clauses
+        key = (goal.op, len(goal.args))
+        first = None
+        if goal.args:
+            first = constant_arg(goal.args[0])
+        if not self.first_arg_index or first is None:
+            entries = self.index.get(key, ())
+        else:
+            entries = heapq.merge(self.by_first.get(key + (first,), ()),
+                                  self.by_first.get(key + (None,), ()))
+        return [c for n, c in entries]
+
+def constant_arg(arg):
+    "arg itself if it is a constant, such as Mac or 23; else None."
+    if isinstance(arg, Expr) and not arg.args and not is_var_symbol(arg.op):
+        return arg
+    return None
 
 def test_ask(query, kb=None):
     q = expr(query)
     vars = variables(q)
-    answers = fol_bc_ask(kb or test_kb, q)
+    answers = (kb or test_kb).ask_generator(q)
     return sorted([pretty(dict((x, v) for x, v in a.items() if x in vars))
                    for a in answers],
                   key=repr)
@@ -995,6 +1855,9 @@ crime_kb = FolKB(
 def fol_bc_ask(KB, query):
     """A simple backward-chaining algorithm for first-order logic. [Fig. 9.6]
     KB should be an instance of FolKB, and goals a list of literals.
+    Bindings are made in a BindingStore and undone on backtracking, and
+    each answer is the substitution for the variables of the query.
+    (fol_bc_or and fol_bc_and are the book's version, with dicts.)
     >>> test_ask('Farmer(x)')
     ['{x: Mac}']
     >>> test_ask('Human(x)')
@@ -1008,7 +1871,31 @@ def fol_bc_ask(KB, query):
     >>> test_ask('Criminal(x)', crime_kb)
     ['{x: West}']
     """
-    return fol_bc_or(KB, query, {})
+    store = BindingStore()
+    qvars = sorted(variables(query), key=repr)
+    for _ in fol_bc_or_store(KB, query, store):
+        yield dict((v, store.resolve(v)) for v in qvars)
+
+def fol_bc_or_store(KB, goal, store):
+    "Generate once for each way goal can be proved, with store bound accordingly."
+    for rule in KB.fetch_rules_for_goal(store.shallow(goal)):
+        if variables(rule): # facts are mostly ground: no need to rename
+            rule = standardize_variables(rule)
+        lhs, rhs = parse_definite_clause(rule)
+        mark = store.mark()
+        if store.unify(rhs, goal):
+            for _ in fol_bc_and_store(KB, lhs, store):
+                yield
+        store.undo(mark)
+
+def fol_bc_and_store(KB, goals, store):
+    if not goals:
+        yield
+    else:
+        first, rest = goals[0], goals[1:]
+        for _ in fol_bc_or_store(KB, first, store):
+            for _ in fol_bc_and_store(KB, rest, store):
+                yield
 
 def fol_bc_or(KB, goal, theta):
     for rule in KB.fetch_rules_for_goal(goal):
@@ -1027,6 +1914,124 @@ def fol_bc_and(KB, goals, theta):
             for theta2 in fol_bc_and(KB, rest, theta1):
                 yield theta2
 
+def fol_bc_ask_tabled(KB, query):
+    """Backward chaining with tabling: the answers to each subgoal (up to
+    renaming of variables) are kept in a table, and a subgoal met again is
+    answered from its table instead of being solved again.  The tables are
+    filled by iterating to a fixpoint, so left-recursive rules, which send
+    fol_bc_ask into an infinite recursion, are fine.  All answers are found
+    before the first one is yielded.
+    >>> kb = FolKB(map(expr, ['Parent(Al, Bo)', 'Parent(Bo, Cy)', 'Parent(Cy, Di)',
+    ...                       '(Ancestor(x, y) & Parent(y, z)) ==> Ancestor(x, z)',
+    ...                       'Parent(x, y) ==> Ancestor(x, y)']), tabled=True)
+    >>> test_ask('Ancestor(Bo, x)', kb)
+    ['{x: Cy}', '{x: Di}']
+    >>> len(test_ask('Ancestor(x, y)', kb))
+    6
+    """
+    tables = {}  # variant_key(goal) -> (answers, variant keys of answers)
+    changed = [True]
+
+    def solve(goal, visited):
+        key = variant_key(goal)
+        if key not in tables:
+            tables[key] = ([], set())
+        answers, known = tables[key]
+        if key in visited:
+            return answers
+        visited.add(key)
+        for rule in KB.fetch_rules_for_goal(goal):
+            lhs, rhs = parse_definite_clause(standardize_variables(rule))
+            for theta in join(lhs, unify(rhs, goal, {}), visited):
+                answer = subst(theta, goal)
+                akey = variant_key(answer)
+                if akey not in known:
+                    known.add(akey)
+                    answers.append(answer)
+                    changed[0] = True
+        return answers
+
+    def join(goals, theta, visited):
+        if theta is None:
+            return
+        if not goals:
+            yield theta
+            return
+        goal = subst(theta, goals[0])
+        for answer in solve(goal, visited):
+            if variables(answer):
+                answer = standardize_variables(answer)
+            for theta1 in join(goals[1:], unify(goal, answer, theta), visited):
+                yield theta1
+
+    while changed[0]:
+        changed[0] = False
+        answers = solve(query, set())
+    for answer in answers:
+        yield unify(query, standardize_variables(answer), {})
+
+def variant_key(x):
+    """x with its variables renamed in order of appearance, so that goals
+    that are the same up to renaming have equal keys.
+    >>> variant_key(expr('F(y, G(x, y))')) == variant_key(expr('F(x, G(z, x))'))
+    True
+    """
+    names = {}
+    def rename(x):
+        if is_variable(x):
+            if x not in names:
+                names[x] = Expr('v%d' % len(names))
+            return names[x]
+        elif isinstance(x, Expr) and x.args:
+            return Expr(x.op, *map(rename, x.args))
+        return x
+    return rename(x)
+
+def family_kb(n):
+    """A FolKB of the family tree of n people, P0 to P<n-1>: the parents
+    of Pi are P<(i-1)/2> and its spouse, so it grows as a binary tree.
+    >>> len(family_kb(15).clauses)
+    49
+    """
+    clauses = map(expr,
+        ['(Parent(x, y) & Male(x)) ==> Father(x, y)',
+         '(Parent(x, y) & Female(x)) ==> Mother(x, y)',
+         '(Parent(x, y) & Parent(y, z)) ==> Grandparent(x, z)',
+         'Parent(x, y) ==> Ancestor(x, y)',
+         '(Parent(x, y) & Ancestor(y, z)) ==> Ancestor(x, z)',
+         '(Parent(p, x) & Parent(p, y)) ==> Related(x, y)'])
+    for i in range(n):
+        clauses.append(expr('%s(P%d)' % (if_(i % 2, 'Female', 'Male'), i)))
+        if i:
+            clauses.append(expr('Parent(P%d, P%d)' % ((i - 1) / 2, i)))
+            clauses.append(expr('Parent(S%d, P%d)' % ((i - 1) / 2, i)))
+    return FolKB(clauses)
+
+def compare_fol_bc(n=255):
+    """Time fol_bc_ask against the book's fol_bc_or (dict substitutions)
+    on crime_kb and on family_kb(n), printing the time each takes to find
+    all the answers to some queries, and how many there were."""
+    import time
+    family = family_kb(n)
+    problems = [(crime_kb, 'Criminal(x)'), (crime_kb, 'Sells(x, y, z)'),
+                (family, 'Grandparent(P0, x)'), (family, 'Ancestor(P0, x)'),
+                (family, 'Father(x, P%d)' % (n - 1)),
+                (family, 'Related(P%d, x)' % (n - 1)),
+                (family, 'Ancestor(x, P%d)' % (n - 1))]
+    def timed(fn):
+        start = time.time()
+        count = len(list(fn()))
+        return count, time.time() - start
+    table = []
+    for kb, query in problems:
+        q = expr(query)
+        count, t_book = timed(lambda: fol_bc_or(kb, q, {}))
+        count2, t_store = timed(lambda: fol_bc_ask(kb, q))
+        assert count == count2
+        table.append([query, count, t_book, t_store])
+    print_table(table, header=['Query', 'Answers', 'Dicts(s)', 'Store(s)'],
+                numfmt='%.4g')
+
 #______________________________________________________________________________
 
 # Example application (not in the book).
@@ -1240,6 +2245,9 @@ False
 True
 >>> pl_resolution(PropKB(Fig[7,13]), alpha)
 True
+>>> kb = PropKB(Fig[7,13], entails=pl_resolution)
+>>> kb.ask(alpha), kb.ask(expr('P21'))
+({}, False)
 
 ### [Fig. 7.15]
 >>> pl_fc_entails(Fig[7,15], expr('SomethingSilly'))
@@ -16,9 +16,13 @@
 # (see http://minisat.se) SAT solver, and is directly based on the satispy
 # python project, see https://github.com/netom/satispy .
 
+import sys
 from logic import *
-from subprocess import call
+from subprocess import call, Popen, PIPE
 from tempfile import NamedTemporaryFile
+from operator import itemgetter
+from string import maketrans
+from solver_trace import TRACE, timer
 
 # The following is a fairly direct adaptation of the very nice,
 # slim wrapper to minisat provided by https://github.com/netom/satispy
@@ -30,6 +34,8 @@ class AIMA_to_Dimacs_Translator(object):
     def __init__(self):
         self.varname_dict = {}
         self.varobj_dict = {}
+        self.num_variables = 0
+        self.num_clauses = 0
 
     def varname(self, vo):
         return self.varname_dict[vo]
@@ -49,6 +55,7 @@ class AIMA_to_Dimacs_Translator(object):
         self.varname_dict = {}
         self.varobj_dict = {}
         variables = prop_symbols_from_clause_list(clauses)
+        self.num_variables, self.num_clauses = len(variables), len(clauses)
         ret = 'p cnf %d %d' % (len(variables), len(clauses))
         varis = dict(zip(sorted(variables, key=lambda v: v.op),
                          map(str, range(1, len(variables) + 1))))
@@ -132,32 +139,175 @@ class AIMA_to_Dimacs_Translator(object):
                 clause_count += 1
                 ret_clauses += ret_clause + ' 0\n'
 
+        self.num_variables, self.num_clauses = len(variables), clause_count
         ret_header = 'p cnf %d %d\n' % (len(variables), clause_count)
         ret = ret_header + ret_clauses
         return ret
 
+class SymbolTableTranslator(AIMA_to_Dimacs_Translator):
+    """ Numbers the variables by a symbol table, such as
+    wumpus_kb.WumpusSymbolTable, instead of afresh for each call: the
+    DIMACS number of a symbol is table.var_of(symbol), and table.symbol(v)
+    is the symbol numbered v.  The clauses are then not scanned for their
+    symbols and sorted, and a variable set to a value is simply added as
+    a unit clause.  Every symbol must be known to the table.  Pass
+    functools.partial(SymbolTableTranslator, table) to Minisat.solve.
+    >>> from wumpus_kb import WumpusSymbolTable
+    >>> io = SymbolTableTranslator(WumpusSymbolTable(1, 2, 1, 2))
+    >>> print io.to_dimacs_string([expr('P1_1 | ~W1_2'), expr('L2_2_0')])
+    p cnf 42 2
+    1 -6 0
+    24 0
+    >>> io.varobj('24')
+    L2_2_0
+
+    Minisat.solve gives an unsuccessful Solution for a symbol the table
+    does not know, so PropKB_SAT.ask answers None, as for any unknown.
+    >>> Minisat().solve([expr('P1_1')], expr('P1_9'), True,
+    ...                 lambda: SymbolTableTranslator(io.table)).success
+    False
+    """
+
+    def __init__(self, table):
+        super(SymbolTableTranslator, self).__init__()
+        self.table = table
+
+    def varname(self, vo):
+        v = self.table.var_of(vo)
+        if v is None or v > self.num_variables:
+            raise KeyError(vo)
+        return str(v)
+
+    def varobj(self, v):
+        return self.table.symbol(int(v))
+
+    def number(self, literal):
+        if literal.op == '~':
+            v = self.table.var_of(literal.args[0])
+            sign = '-'
+        else:
+            v = self.table.var_of(literal)
+            sign = ''
+        if v is None:
+            raise KeyError('{0} is not in the symbol table'.format(literal))
+        return sign + str(v)
+
+    def to_dimacs_string(self, clauses, extra = ''):
+        number = self.number
+        lines = []
+        for clause in clauses:
+            if clause.op == '|':
+                lines.append(' '.join(map(number, clause.args)) + ' 0')
+            else:
+                lines.append(number(clause) + ' 0')
+        if extra:
+            lines.append(extra)
+        # after the clauses: numbering them may have allocated new ids
+        self.num_variables, self.num_clauses = self.table.size, len(lines)
+        lines.insert(0, 'p cnf %d %d' % (self.num_variables, self.num_clauses))
+        return '\n'.join(lines)
+
+    def to_dimacs_string_set_variable_value(self, clauses, variable, value):
+        return self.to_dimacs_string(clauses,
+                                     self.number(variable if value else ~variable) + ' 0')
+
+# Translation table used to decode a model in one step: the first
+# character of each literal is '-' for False (stored as 2) and a digit
+# for True (stored as 1).
+_SIGN_TABLE = maketrans('-123456789', '\x02' + '\x01' * 9)
+
 class Solution(object):
+    """ The result of a call to minisat.
+    The model is stored compactly in a bytearray indexed by DIMACS variable
+    number (0 = unassigned, 1 = True, 2 = False); the AIMA Expr for a
+    variable is only looked up (via the translator) when it is asked for. """
 
-    def __init__(self, success = False, varmap = {}):
+    def __init__(self, success = False, varmap = None, model = None, translator = None):
         self.success = success
-        self.varmap = varmap
+        self.model = model
+        self.translator = translator
+        self._varmap = varmap
+        # filled in by Minisat.solve: clauses, variables,
+        # serialize_time and solve_time
+        self.stats = {}
 
     def __repr__(self):
         return '<mSat.Sol {0}>'.format(self.success)
 
+    @property
+    def varmap(self):
+        """ The model as a dict of {Expr: bool}, built on first use. """
+        if self._varmap is None:
+            self._varmap = {}
+            if self.model is not None:
+                varobj = self.translator.varobj
+                for v, val in enumerate(self.model):
+                    if val:
+                        self._varmap[varobj(str(v))] = (val == 1)
+        return self._varmap
+
     def __getitem__(self, i):
-        return self.varmap[i]
+        if self._varmap is not None or self.model is None:
+            return self.varmap[i]
+        val = self.model[int(self.translator.varname(i))]
+        if not val:
+            raise KeyError(i)
+        return val == 1
+
+    def get(self, i, default = None):
+        try:
+            return self[i]
+        except KeyError:
+            return default
+
+    def __contains__(self, i):
+        return self.get(i) is not None
 
     def pprint(self):
         print self.success
         print self.varmap
 
+def decode_model(literals, num_variables):
+    """ Return the bytearray model for a list of DIMACS literal strings.
+    >>> list(decode_model(['1', '-2', '3'], 3))
+    [0, 1, 2, 1]
+    >>> list(decode_model(['-3', '1'], 4))
+    [0, 1, 0, 2, 0]
+    """
+    model = bytearray(num_variables + 1)
+    if len(literals) == num_variables:
+        # minisat lists every variable in order, so only the signs are
+        # needed, and they can be decoded without a Python-level loop
+        model[1:] = ''.join(map(itemgetter(0), literals)).translate(_SIGN_TABLE)
+    else:
+        for v in literals:
+            if v[0] == '-':
+                model[int(v[1:])] = 2
+            else:
+                model[int(v)] = 1
+    return model
+
 
 class Minisat(object):
+    # Shell command used with temporary files (the original interface)
     COMMAND = 'minisat %s %s > /dev/null'
+    # Argument vector used when streaming: the DIMACS problem is written to
+    # minisat's stdin and the model is read back from its stdout, so no
+    # files are created and no shell is started.
+    PIPE_COMMAND = ['minisat', '-verb=0', '/dev/stdin', '/dev/stdout']
 
-    def __init__(self, command = COMMAND):
+    def __init__(self, command = PIPE_COMMAND, trace = True):
+        """ command is either an argument vector (list), in which case minisat
+        is run through pipes, or a shell command string with two %s slots
+        for the input and output file names, in which case temporary files
+        are used.  If trace is False, solve() does not add its own events
+        to the solver trace (the caller is expected to). """
         self.command = command
+        self.pipe = not isinstance(command, str)
+        self.trace = trace
+        self.process = None   # the running minisat, when piped
+        self.killed = False
+        self.returncode = None  # of the last run (10 = SAT, 20 = UNSAT)
 
     def solve(self, cnf, variable = None, value = True,
               translator = AIMA_to_Dimacs_Translator):
@@ -169,33 +319,86 @@ class Minisat(object):
         #     and therefore will also return None
         if not cnf: return Solution(None)
         
+        start = timer()
         s = Solution()
-        infile = NamedTemporaryFile(mode='w')
-        outfile = NamedTemporaryFile(mode='r')
         io = translator()
-        if variable:
-            dimacs = io.to_dimacs_string_set_variable_value(cnf, variable, value)
-            if dimacs:
-                infile.write(dimacs)
+        try:
+            if variable:
+                dimacs = io.to_dimacs_string_set_variable_value(cnf, variable, value)
             else:
-                return s
+                dimacs = io.to_dimacs_string(cnf)
+        except KeyError: # a symbol the translator's table does not know
+            dimacs = None
+        if not dimacs:
+            self.record(s, io, start, timer(), timer())
+            return s
+        serialized = timer()
+        if self.pipe:
+            ret, output = self.run_pipe(dimacs)
         else:
-            infile.write(io.to_dimacs_string(cnf))
-        infile.flush()
-        ret = call(self.command % (infile.name, outfile.name), shell=True)
-        infile.close()
+            ret, output = self.run_files(dimacs)
+        self.returncode = ret
         if ret != 10:
+            self.record(s, io, start, serialized, timer())
             return s
         s.success = True
-        lines = outfile.readlines()[1:]
-        for line in lines:
-            varz = line.split(' ')[:-1]
-            for v in varz:
-                v = v.strip()
-                value = v[0] != '-'
-                v = v.lstrip('-')
-                vo = io.varobj(v)
-                s.varmap[vo] = value
+        # The model is the list of literals between the 'SAT' line and
+        # the terminating 0 (anything else minisat prints is skipped).
+        tokens = output.split()
+        first = tokens.index('SAT') + 1
+        s.model = decode_model(tokens[first:tokens.index('0', first)],
+                               io.num_variables)
+        s.translator = io
 
-        outfile.close()
+        self.record(s, io, start, serialized, timer())
         return s
+
+    def run_pipe(self, dimacs):
+        """ Run minisat on the DIMACS string, without a shell or temporary
+        files.  Return minisat's exit code (10 = SAT, 20 = UNSAT) and
+        everything it wrote to stdout.  If the command can't be run, the
+        exit code is 127, as a shell gives for a command not found. """
+        try:
+            p = Popen(self.command, stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                      close_fds=True)
+        except OSError, e:
+            print >> sys.stderr, '{0}: could not run: {1}'.format(self.command[0], e)
+            return 127, ''
+        self.process = p
+        if self.killed:
+            p.kill()
+        output, _ = p.communicate(dimacs)
+        self.process = None
+        return p.returncode, output
+
+    def kill(self):
+        """ Stop a piped solve() running in another thread; that solve()
+        then returns an unsuccessful Solution, which should be ignored. """
+        self.killed = True
+        p = self.process
+        if p is not None and p.poll() is None:
+            try:
+                p.kill()
+            except OSError: # it exited in the meantime
+                pass
+
+    def run_files(self, dimacs):
+        """ Run the shell command on temporary input and output files. """
+        infile = NamedTemporaryFile(mode='w')
+        outfile = NamedTemporaryFile(mode='r')
+        infile.write(dimacs)
+        infile.flush()
+        ret = call(self.command % (infile.name, outfile.name), shell=True)
+        infile.close()
+        output = outfile.read()
+        outfile.close()
+        return ret, output
+
+    def record(self, s, io, start, serialized, end):
+        """Attach timing and size statistics to Solution s, and add them to
+        the solver trace (if tracing is enabled)."""
+        s.stats = dict(clauses=io.num_clauses, variables=io.num_variables,
+                       serialize_time=serialized - start,
+                       solve_time=end - serialized)
+        if self.trace:
+            TRACE.record('solve', start, end, result=s.success, **s.stats)
@@ -0,0 +1,249 @@
+# portfolio.py
+# ------------
+# Licensing Information:
+# Please DO NOT DISTRIBUTE OR PUBLISH solutions to this project.
+# You are free to use and extend these projects for EDUCATIONAL PURPOSES ONLY.
+# The Hunt The Wumpus AI project was developed at University of Arizona
+# by Clay Morrison (clayton@sista.arizona.edu), spring 2013.
+# This project extends the python code provided by Peter Norvig as part of
+# the Artificial Intelligence: A Modern Approach (AIMA) book example code;
+# see http://aima.cs.berkeley.edu/code.html
+# In particular, the following files come directly from the AIMA python
+# code: ['agents.py', 'logic.py', 'search.py', 'utils.py']
+# ('logic.py' has been modified by Clay Morrison in locations with the
+# comment 'CTM')
+# The file ['minisat.py'] implements a slim system call wrapper to the minisat
+# (see http://minisat.se) SAT solver, and is directly based on the satispy
+# python project, see https://github.com/netom/satispy .
+
+"""Portfolio SAT solving: race several solvers on the same problem.
+
+A Portfolio has the same solve(cnf, variable, value) interface as
+minisat.Minisat, so it can be used as the solver of a PropKB_SAT.  Each
+call starts every configured backend at once, each driven by its own
+thread: the external minisat command runs in its own process already, and
+the in-process solvers from logic.py (DPLL, WalkSAT) are run in a forked
+child process so that they can be stopped.  The first definitive answer
+wins and the other backends are killed.
+
+WalkSAT can only ever prove satisfiability, so when it fails to find a
+model its answer is not definitive; if no backend gives a definitive
+answer, the Solution's success is None (unknown).
+
+>>> p = Portfolio([DPLLBackend()])
+>>> p.solve([expr('A | B'), expr('~A')]).success
+True
+>>> p.solve([expr('A | B'), expr('~A')], expr('B'), False).success
+False
+>>> p.wins['dpll']
+2
+"""
+
+import os
+import threading
+import multiprocessing
+from Queue import Queue as SyncQueue # utils has its own Queue
+from collections import Counter
+
+from logic import *
+from utils import print_table
+import minisat as msat
+from solver_trace import TRACE, timer
+from subprocess import MAXFD
+
+#-------------------------------------------------------------------------------
+
+class Ticket(object):
+    """ Handle through which the portfolio cancels one backend's run.  The
+    backend attaches the function that stops it (it may be cancelled before
+    it gets that far, in which case the function is called at once). """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.stop = None
+
+    def attach(self, stop):
+        with self.lock:
+            self.stop = stop
+            cancelled = self.cancelled
+        if cancelled:
+            stop()
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            stop = self.stop
+        if stop:
+            stop()
+
+def condition(cnf, variable, value):
+    """ The clauses of cnf, with <variable> forced to <value> (as in
+    Minisat.solve) by adding a unit clause. """
+    if not variable:
+        return cnf
+    return cnf + [variable if value else ~variable]
+
+def _child(send, fn, args):
+    # The fork copied every open descriptor, including the pipes of any
+    # minisat started by another thread; holding those open would keep
+    # that minisat from ever seeing the end of its input.
+    fd = send.fileno()
+    os.closerange(3, fd)
+    os.closerange(fd + 1, MAXFD)
+    try:
+        send.send(('ok', fn(*args)))
+    except Exception, e:
+        send.send(('error', repr(e)))
+    send.close()
+
+def run_in_process(fn, args, ticket):
+    """ Call fn(*args) in a forked child and return ('ok', result) or
+    ('error', message); ('cancelled', None) if the ticket was cancelled.
+    The arguments are inherited by the fork, only the result is pickled. """
+    recv, send = multiprocessing.Pipe(duplex = False)
+    p = multiprocessing.Process(target = _child, args = (send, fn, args))
+    p.daemon = True
+    p.start()
+    send.close()
+    ticket.attach(p.terminate)
+    try:
+        result = recv.recv()
+    except EOFError: # terminated (or crashed) before sending anything
+        result = ('cancelled', None) if ticket.cancelled else ('error', 'died')
+    recv.close()
+    p.join()
+    return result
+
+#-------------------------------------------------------------------------------
+# Backends.  run(cnf, variable, value, ticket, translator) returns a
+# minisat.Solution; success is True/False for a definitive answer and None
+# otherwise.  The translator (as for Minisat.solve) only matters to minisat.
+
+class MinisatBackend(object):
+    """ The external minisat command, through pipes. """
+    name = 'minisat'
+
+    def __init__(self, command = msat.Minisat.PIPE_COMMAND):
+        self.command = command
+
+    def run(self, cnf, variable, value, ticket, translator):
+        m = msat.Minisat(self.command, trace = False)
+        ticket.attach(m.kill)
+        s = m.solve(cnf, variable, value, translator)
+        if m.killed or (s.success is False and m.returncode not in (None, 20)):
+            s.success = None
+        return s
+
+def dpll_model(clauses):
+    " A model of the (CNF) clauses found by logic.DPLLSolver, or False. "
+    solver = DPLLSolver(clauses)
+    return solver.solve() and solver.model()
+
+class DPLLBackend(object):
+    """ logic.DPLLSolver on the clause list (which is already in CNF). """
+    name = 'dpll'
+
+    def run(self, cnf, variable, value, ticket, translator = None):
+        clauses = condition(cnf, variable, value)
+        status, model = run_in_process(dpll_model, (clauses,), ticket)
+        if status != 'ok':
+            return msat.Solution(None)
+        if model is False:
+            return msat.Solution(False)
+        return msat.Solution(True, model)
+
+class WalkSATBackend(object):
+    """ logic.WalkSAT; incomplete, so only a model found is definitive. """
+    name = 'walksat'
+
+    def __init__(self, p = 0.5, max_flips = 10000):
+        self.p = p
+        self.max_flips = max_flips
+
+    def run(self, cnf, variable, value, ticket, translator = None):
+        clauses = condition(cnf, variable, value)
+        status, model = run_in_process(WalkSAT, (clauses, self.p, self.max_flips),
+                                       ticket)
+        if status != 'ok' or not model:
+            return msat.Solution(None)
+        return msat.Solution(True, model)
+
+BACKENDS = {'minisat': MinisatBackend,
+            'dpll': DPLLBackend,
+            'walksat': WalkSATBackend}
+
+#-------------------------------------------------------------------------------
+
+class Portfolio(object):
+    """ Race the backends on each solve(); keep count of which one wins.
+    wins[name] counts the calls won by backend name, win_time[name] the
+    total time those calls took; undecided counts calls nobody answered. """
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.wins = Counter()
+        self.win_time = Counter()
+        self.undecided = 0
+
+    def solve(self, cnf, variable = None, value = True,
+              translator = msat.AIMA_to_Dimacs_Translator):
+        if not cnf: return msat.Solution(None)
+        start = timer()
+        results = SyncQueue()
+        tickets = []
+        for backend in self.backends:
+            ticket = Ticket()
+            tickets.append(ticket)
+            t = threading.Thread(target = self._run,
+                                 args = (backend, cnf, variable, value, ticket,
+                                         translator, results))
+            t.daemon = True
+            t.start()
+        winner, s = None, msat.Solution(None)
+        for _ in self.backends:
+            name, solution = results.get()
+            if solution.success is not None:
+                winner, s = name, solution
+                break
+        for ticket in tickets:
+            ticket.cancel()
+        end = timer()
+        if winner:
+            self.wins[winner] += 1
+            self.win_time[winner] += end - start
+        else:
+            self.undecided += 1
+        s.stats = dict(s.stats, backend = winner)
+        TRACE.record('solve', start, end, result = s.success, **s.stats)
+        return s
+
+    def _run(self, backend, cnf, variable, value, ticket, translator, results):
+        try:
+            s = backend.run(cnf, variable, value, ticket, translator)
+        except Exception:
+            s = msat.Solution(None)
+        results.put((backend.name, s))
+
+    def print_stats(self):
+        rows = [[b.name, self.wins[b.name], self.win_time[b.name]]
+                for b in self.backends]
+        rows.append(['(undecided)', self.undecided, 0.0])
+        print_table(rows, header = ['Backend', 'Wins', 'Time(s)'], numfmt = '%.4g')
+
+def make_solver(names):
+    """ A solver for PropKB_SAT from a comma-separated list of backend names:
+    a plain minisat.Minisat for 'minisat' alone, otherwise a Portfolio.
+    >>> make_solver('minisat')                            # doctest: +ELLIPSIS
+    <minisat.Minisat object at ...>
+    >>> [b.name for b in make_solver('minisat,dpll').backends]
+    ['minisat', 'dpll']
+    """
+    names = [n.strip() for n in names.split(',')]
+    for n in names:
+        if n not in BACKENDS:
+            raise ValueError("Unknown SAT backend '{0}' (choose from {1})"
+                             .format(n, ', '.join(sorted(BACKENDS))))
+    if names == ['minisat']:
+        return msat.Minisat()
+    return Portfolio([BACKENDS[n]() for n in names])
@@ -27,6 +27,8 @@ functions."""
 
 from utils import *
 import math, random, sys, time, bisect, string
+import csv, json, multiprocessing, resource, itertools
+from array import array
 
 #______________________________________________________________________________
 
@@ -75,7 +77,7 @@ class Problem(object):
         abstract
 #______________________________________________________________________________
 
-class Node:
+class Node(object):
     """A node in a search tree. Contains a pointer to the parent (the node
     that this is a successor of) and to the actual state for this node. Note
     that if a state is arrived at by two paths, then there are two nodes with
@@ -83,14 +85,26 @@ class Node:
     the total path_cost (also known as g) to reach the node.  Other functions
     may add an f and h value; see best_first_graph_search and astar_search for
     an explanation of how the f and h values are handled. You will not need to
-    subclass this class."""
+    subclass this class.  Nodes have __slots__ rather than a __dict__, since
+    a search may make millions of them; f and h are unset until assigned.
+    >>> n = Node('B', Node('A'), 'go', 1); n.depth, n.solution()
+    (1, ['go'])
+    >>> hasattr(n, 'f'), hasattr(n, '__dict__')
+    (False, False)
+    """
+
+    __slots__ = ('state', 'parent', 'action', 'path_cost', 'depth', 'f', 'h')
 
     def __init__(self, state, parent=None, action=None, path_cost=0):
         "Create a search tree Node, derived from a parent by an action."
-        update(self, state=state, parent=parent, action=action,
-               path_cost=path_cost, depth=0)
+        self.state = state
+        self.parent = parent
+        self.action = action
+        self.path_cost = path_cost
         if parent:
             self.depth = parent.depth + 1
+        else:
+            self.depth = 0
 
     def __repr__(self):
         return "<Node %s>" % (self.state,)
@@ -108,15 +122,25 @@ class Node:
 
     def solution(self):
         "Return the sequence of actions to go from the root to this node."
-        return [node.action for node in self.path()[1:]]
+        node, actions = self, []
+        while node.parent:
+            actions.append(node.action)
+            node = node.parent
+        actions.reverse()
+        return actions
 
     def path(self):
         "Return a list of nodes forming the path from the root to this node."
-        node, path_back = self, []
+        path_back = list(self.path_back())
+        path_back.reverse()
+        return path_back
+
+    def path_back(self):
+        "Generate the nodes from this node back to the root, lazily."
+        node = self
         while node:
-            path_back.append(node)
+            yield node
             node = node.parent
-        return list(reversed(path_back))
 
     # We want for a queue of nodes in breadth_first_search or
     # astar_search to have no duplicated states, so we treat nodes
@@ -218,35 +242,79 @@ def breadth_first_search(problem):
                 frontier.append(child)
     return None
 
-def best_first_graph_search(problem, f):
+def prefer_high_g():
+    "Break ties in f in favour of the node with the higher path cost."
+    return lambda node: -node.path_cost
+
+def fifo_ties():
+    "Break ties in f in favour of the node added to the frontier first."
+    counter = itertools.count()
+    return lambda node: counter.next()
+
+def lifo_ties():
+    "Break ties in f in favour of the node added to the frontier last."
+    counter = itertools.count()
+    return lambda node: -counter.next()
+
+## The tie-breaking policies of best_first_graph_search, by name.  Each
+## makes a fresh key function (which may count) for one search.
+tie_breakers = {'high_g': prefer_high_g, 'fifo': fifo_ties, 'lifo': lifo_ties}
+
+def best_first_graph_search(problem, f, tie=None, reopen=False, stats=None):
     """Search the nodes with the lowest f scores first.
     You specify the function f(node) that you want to minimize; for example,
     if f is a heuristic estimate to the goal, then we have greedy best
     first search; if f is node.depth then we have breadth-first search.
     There is a subtlety: the line "f = memoize(f, 'f')" means that the f
     values will be cached on the nodes as they are computed. So after doing
-    a best first search you can examine the f values of the path returned."""
+    a best first search you can examine the f values of the path returned.
+    Nodes with equal f are taken in the order of the nodes themselves,
+    unless tie names one of the tie_breakers (or is such a function).
+    An explored state is never searched again, unless reopen is true and
+    a cheaper path to it turns up; with an admissible but inconsistent
+    heuristic, A* needs that to be sure of an optimal solution.  If stats
+    is a dict, it is updated with the counts of nodes expanded, generated,
+    reopened and replaced in the frontier, and the largest frontier."""
     f = memoize(f, 'f')
+    counts = dict(expanded=0, generated=0, reopened=0, replaced=0,
+                  max_frontier=1)
+    def done(node):
+        if stats is not None:
+            stats.update(counts)
+        return node
     node = Node(problem.initial)
     if problem.goal_test(node.state):
-        return node
-    frontier = PriorityQueue(min, f)
+        return done(node)
+    if tie:
+        tie = tie_breakers.get(tie, tie)()
+        frontier = PriorityQueue(min, lambda node: (f(node), tie(node)))
+    else:
+        frontier = PriorityQueue(min, f)
     frontier.append(node)
-    explored = set()
+    explored = {} # state -> path cost when it was expanded
     while frontier:
         node = frontier.pop()
         if problem.goal_test(node.state):
-            return node
-        explored.add(node.state)
+            return done(node)
+        explored[node.state] = node.path_cost
+        counts['expanded'] += 1
         for child in node.expand(problem):
-            if child.state not in explored and child not in frontier:
+            counts['generated'] += 1
+            if child.state in explored:
+                if reopen and child.path_cost < explored[child.state]:
+                    del explored[child.state]
+                    frontier.append(child)
+                    counts['reopened'] += 1
+            elif child not in frontier:
                 frontier.append(child)
-            elif child in frontier:
+            else:
                 incumbent = frontier[child]
                 if f(child) < f(incumbent):
                     del frontier[incumbent]
                     frontier.append(child)
-    return None
+                    counts['replaced'] += 1
+        counts['max_frontier'] = max(counts['max_frontier'], len(frontier))
+    return done(None)
 
 def uniform_cost_search(problem):
     "[Fig. 3.14]"
@@ -285,12 +353,86 @@ def iterative_deepening_search(problem):
 greedy_best_first_graph_search = best_first_graph_search
     # Greedy best-first search is accomplished by specifying f(n) = h(n).
 
-def astar_search(problem, h=None):
+def astar_search(problem, h=None, tie=None, reopen=False, stats=None):
     """A* search is best-first graph search with f(n) = g(n)+h(n).
     You need to specify the h function when you call astar_search, or
-    else in your Problem subclass."""
+    else in your Problem subclass.  For tie, reopen and stats, see
+    best_first_graph_search."""
     h = memoize(h or problem.h, 'h')
-    return best_first_graph_search(problem, lambda n: n.path_cost + h(n))
+    return best_first_graph_search(problem, lambda n: n.path_cost + h(n),
+                                   tie, reopen, stats)
+
+def bidirectional_astar_search(problem, h=None, h_back=None):
+    """Search forward from the initial state and backward from the goal at
+    once, each side an A* search, until they meet.  The problem must be a
+    GraphProblem (or a MultiGoalGraphProblem, in which case the backward
+    side starts from every goal).  h is the forward heuristic (default
+    problem.h) and h_back the backward one (default: the straight-line
+    distance back to the initial node).  A state is reopened whenever a
+    shorter path to it is found, and the search stops once neither frontier
+    can lead to a shorter path than the best one found (Pohl's criterion),
+    so the path is optimal for admissible h and h_back."""
+    backward = problem.reverse()
+    h = memoize(h or problem.h, 'h')
+    h_back = memoize(h_back or backward.h, 'h')
+    return bidirectional_graph_search(problem, backward,
+                                      lambda n: n.path_cost + h(n),
+                                      lambda n: n.path_cost + h_back(n))
+
+def bidirectional_uniform_cost_search(problem):
+    """Bidirectional Dijkstra: bidirectional_astar_search without heuristics.
+    With f = g on both sides it can stop as soon as the two smallest
+    frontier costs add up to the best path found."""
+    return bidirectional_graph_search(problem, problem.reverse(),
+                                      lambda n: n.path_cost,
+                                      lambda n: n.path_cost, costs=True)
+
+def bidirectional_graph_search(problem, backward, f, f_back, costs=False):
+    """The search behind bidirectional_astar_search, with the f functions
+    of the two sides.  costs=True says both f functions are path costs.
+    Each step expands the side with the smaller frontier.  Returns a Node
+    for the whole path, from the initial state, or None."""
+    sides = []
+    for prob, fn, starts in [(problem, f, [problem.initial]),
+                             (backward, f_back, problem.goal_states())]:
+        frontier, reached = PriorityQueue(min, fn), {}
+        for state in starts:
+            node = Node(state)
+            reached[state] = node
+            frontier.append(node)
+        sides.append((prob, frontier, reached))
+    best, meet = infinity, None
+    for state in problem.goal_states():
+        if state == problem.initial:
+            best, meet = 0, (sides[0][2][state], sides[1][2][state])
+    while sides[0][1] and sides[1][1]:
+        f_min, f_back_min = sides[0][1].A[0][0], sides[1][1].A[0][0]
+        if best <= max(f_min, f_back_min):
+            break
+        if costs and best <= f_min + f_back_min:
+            break
+        k = if_(len(sides[0][1]) <= len(sides[1][1]), 0, 1)
+        (prob, frontier, reached), other = sides[k], sides[1 - k][2]
+        for child in frontier.pop().expand(prob):
+            incumbent = reached.get(child.state)
+            if incumbent and incumbent.path_cost <= child.path_cost:
+                continue
+            if incumbent and incumbent in frontier:
+                del frontier[incumbent]
+            reached[child.state] = child
+            frontier.append(child)
+            if child.state in other:
+                cost = child.path_cost + other[child.state].path_cost
+                if cost < best:
+                    best, meet = cost, [child, other[child.state]]
+                    if k: meet.reverse()
+    if meet is None:
+        return None
+    node, back = meet
+    while back.parent:
+        back = back.parent
+        node = node.child_node(problem, back.state)
+    return node
 
 #______________________________________________________________________________
 # Other search algorithms
@@ -325,6 +467,111 @@ def recursive_best_first_search(problem, h=None):
     result, bestf = RBFS(problem, node, infinity)
     return result
 
+# The searches below keep their own stacks, so they are not limited by the
+# depth of Python's recursion, and they remember states they have seen in a
+# transposition table of at most table_size entries; once it is full, no new
+# states are added (the states on the current path are always avoided).
+
+def state_key(state):
+    "A hashable stand-in for a state; lists (as in NQueensProblem) become tuples."
+    if isinstance(state, list):
+        return tuple(state)
+    return state
+
+def ida_star_search(problem, h=None, table_size=100000):
+    """Iterative-deepening A*: depth-first searches bounded by f = g + h,
+    each with the bound raised to the smallest f that exceeded the last.
+    Within one iteration a state reached again at no smaller cost is pruned,
+    which saves the re-expansion of transpositions that plain IDA* (and
+    iterative_deepening_search) suffers.  Optimal for admissible h."""
+    h = memoize(h or problem.h, 'h')
+    root = Node(problem.initial)
+    bound = h(root)
+    while bound < infinity:
+        next_bound, table, on_path = infinity, {}, set()
+        path, stack = [], [[root]]
+        while stack:
+            if not stack[-1]:
+                stack.pop()
+                if path: on_path.discard(state_key(path.pop().state))
+                continue
+            node = stack[-1].pop()
+            f = node.path_cost + h(node)
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            key = state_key(node.state)
+            seen = table.get(key)
+            if key in on_path or (seen is not None and seen <= node.path_cost):
+                continue
+            if seen is not None or len(table) < table_size:
+                table[key] = node.path_cost
+            if problem.goal_test(node.state):
+                return node
+            path.append(node)
+            on_path.add(key)
+            children = node.expand(problem)
+            children.reverse()
+            stack.append(children)
+        bound = next_bound
+    return None
+
+def iterative_rbfs_search(problem, h=None, table_size=100000):
+    """recursive_best_first_search, with an explicit stack of (node, f limit,
+    successors) frames.  When a subtree is given up, its backed-up f value
+    is kept in the transposition table (with the path cost it was reached
+    at), and a later node for the same state starts from that value, raised
+    by any extra path cost, instead of the plain g + h.  Successors whose
+    state is already on the path are dropped.  A node without successors
+    fails with an f of infinity, as in the recursive version, and so does
+    a subtree whose best f is infinity: it cannot hold a goal."""
+    h = memoize(h or problem.h, 'h')
+    table, on_path = {}, set()
+
+    def successors(node):
+        result = []
+        for s in node.expand(problem):
+            key = state_key(s.state)
+            if key in on_path:
+                continue
+            s.f = max(s.path_cost + h(s), node.f)
+            if key in table:
+                g, f = table[key]
+                if s.path_cost >= g:
+                    s.f = max(s.f, f + s.path_cost - g)
+            result.append(s)
+        return result
+
+    root = Node(problem.initial)
+    root.f = h(root)
+    if problem.goal_test(root.state):
+        return root
+    on_path.add(state_key(root.state))
+    stack = [(root, infinity, successors(root))]
+    while stack:
+        node, flimit, succs = stack[-1]
+        if not succs:
+            best_f = infinity
+        else:
+            succs.sort(key=lambda s: s.f)
+            best_f = succs[0].f
+        if best_f > flimit or best_f == infinity:
+            stack.pop()
+            key = state_key(node.state)
+            on_path.discard(key)
+            if key in table or len(table) < table_size:
+                table[key] = (node.path_cost, best_f)
+            if stack:
+                stack[-1][2][0].f = best_f
+            continue
+        best = succs[0]
+        if problem.goal_test(best.state):
+            return best
+        alternative = if_(len(succs) > 1, lambda: succs[1].f, infinity)
+        on_path.add(state_key(best.state))
+        stack.append((best, min(flimit, alternative), successors(best)))
+    return None
+
 def hill_climbing(problem):
     """From the initial node, keep choosing the neighbor with highest value,
     stopping when no neighbor is better. [Fig. 4.2]"""
@@ -374,28 +621,55 @@ def lrta_star_agent(s1):
 #______________________________________________________________________________
 # Genetic Algorithm
 
-def genetic_search(problem, fitness_fn, ngen=1000, pmut=0.1, n=20):
+def genetic_search(problem, fitness_fn=None, ngen=1000, pmut=0.1, n=20,
+                   pool=None):
     """Call genetic_algorithm on the appropriate parts of a problem.
     This requires the problem to have states that can mate and mutate,
-    plus a value method that scores states."""
-    s = problem.initial_state
+    plus a value method that scores states (used if fitness_fn is None)."""
+    s = problem.initial
     states = [problem.result(s, a) for a in problem.actions(s)]
     random.shuffle(states)
-    return genetic_algorithm(states[:n], problem.value, ngen, pmut)
-
-def genetic_algorithm(population, fitness_fn, ngen=1000, pmut=0.1):
-    "[Fig. 4.8]"
+    return genetic_algorithm(states[:n], fitness_fn or problem.value, ngen,
+                             pmut, pool)
+
+def genetic_algorithm(population, fitness_fn, ngen=1000, pmut=0.1, pool=None):
+    """[Fig. 4.8]  The fitness of each individual is computed once per
+    generation, with pool.map if a multiprocessing.Pool is given (then
+    fitness_fn and the individuals must be picklable), and parents are
+    drawn from one cumulative-weight sampler per generation.
+    >>> class Bits(GAState):
+    ...     def mutate(self):
+    ...         i = random.randrange(len(self.genes))
+    ...         self.genes[i] = 1 - self.genes[i]
+    >>> calls = []
+    >>> def ones(x):
+    ...     calls.append(x)
+    ...     return sum(x.genes)
+    >>> random.seed(7)
+    >>> population = [Bits([random.choice([0, 1]) for i in range(20)])
+    ...               for j in range(30)]
+    >>> best = genetic_algorithm(population, ones, ngen=40)
+    >>> sum(best.genes) >= 16, len(calls) == 30 * 41
+    (True, True)
+    """
+    evaluate = map
+    if pool:
+        evaluate = pool.map
+    fitnesses = evaluate(fitness_fn, population)
     for i in range(ngen):
+        if sum(fitnesses) > 0:
+            sample = weighted_sampler(population, fitnesses)
+        else:
+            sample = lambda: random.choice(population)
         new_population = []
-        for i in len(population):
-            fitnesses = map(fitness_fn, population)
-            p1, p2 = weighted_sample_with_replacement(population, fitnesses, 2)
-            child = p1.mate(p2)
+        for j in range(len(population)):
+            child = sample().mate(sample())
             if random.uniform(0, 1) < pmut:
                 child.mutate()
             new_population.append(child)
         population = new_population
-    return argmax(population, fitness_fn)
+        fitnesses = evaluate(fitness_fn, population)
+    return population[argmax(range(len(population)), lambda j: fitnesses[j])]
 
 class GAState:
     "Abstract class for individuals in a genetic search."
@@ -464,6 +738,18 @@ class Graph:
         "Return a list of nodes in the graph."
         return self.dict.keys()
 
+    def inverse(self):
+        """Return a graph with every link reversed; an undirected graph is
+        its own inverse.  Any locations are shared with this graph."""
+        if not self.directed: return self
+        g = Graph()
+        for a in self.dict.keys():
+            for (b, distance) in self.dict[a].items():
+                g.connect1(b, a, distance)
+        if hasattr(self, 'locations'):
+            g.locations = self.locations
+        return g
+
 def UndirectedGraph(dict=None):
     "Build a Graph where every edge (including future ones) goes both ways."
     return Graph(dict=dict, directed=False)
@@ -475,25 +761,89 @@ def RandomGraph(nodes=range(10), min_links=2, width=400, height=300,
     Then each node is connected to the min_links nearest neighbors.
     Because inverse links are added, some nodes will have more connections.
     The distance between nodes is the hypotenuse times curvature(),
-    where curvature() defaults to a random number between 1.1 and 1.5."""
+    where curvature() defaults to a random number between 1.1 and 1.5.
+    Neighbors are looked up in GridBuckets, so that graphs of 10^5 nodes
+    can be built; nearest-neighbor ties go to the earlier node in nodes."""
     g = UndirectedGraph()
     g.locations = {}
     ## Build the cities
     for node in nodes:
         g.locations[node] = (random.randrange(width), random.randrange(height))
+    buckets = GridBuckets(nodes, g.locations)
     ## Build roads from each city to at least min_links nearest neighbors.
     for i in range(min_links):
         for node in nodes:
             if len(g.get(node)) < min_links:
                 here = g.locations[node]
-                def distance_to_node(n):
-                    if n is node or g.get(node,n): return infinity
-                    return distance(g.locations[n], here)
-                neighbor = argmin(nodes, distance_to_node)
+                neighbor = buckets.nearest(here, lambda n: not (
+                    n is node or g.get(node,n)))
+                if neighbor is None: continue
                 d = distance(g.locations[neighbor], here) * curvature()
                 g.connect(node, neighbor, int(d))
     return g
 
+class GridBuckets:
+    """The items of a list, filed by their (x, y) locations into square
+    buckets of side size, for finding nearest neighbors without looking at
+    every item.  By default the size puts about two items in each bucket.
+    >>> b = GridBuckets('abcd', dict(a=(0, 0), b=(5, 1), c=(9, 9), d=(1, 5)))
+    >>> b.nearest((6, 6)), b.nearest((6, 6), lambda item: item != 'c')
+    ('c', 'b')
+    """
+
+    def __init__(self, items, locations, size=None):
+        update(self, locations=locations, buckets={})
+        if not items:
+            self.size, self.bounds = 1, (0, 0, 0, 0)
+            return
+        xs = [locations[item][0] for item in items]
+        ys = [locations[item][1] for item in items]
+        if size is None:
+            area = (max(xs) - min(xs) + 1) * (max(ys) - min(ys) + 1)
+            size = max(1.0, math.sqrt(2.0 * area / len(xs)))
+        self.size = size
+        for i, item in enumerate(items):
+            x, y = locations[item]
+            self.buckets.setdefault(self.bucket((x, y)),
+                                    []).append((i, item, x, y))
+        self.bounds = (self.bucket((min(xs), min(ys))) +
+                       self.bucket((max(xs), max(ys))))
+
+    def bucket(self, (x, y)):
+        return (int(x // self.size), int(y // self.size))
+
+    def nearest(self, here, allowed=lambda item: True):
+        """The allowed item nearest to here (the earliest in the list on a
+        tie), or None.  Rings of buckets around here are searched outwards
+        until no bucket left can hold anything nearer."""
+        cx, cy = self.bucket(here)
+        hx, hy = here
+        x0, y0, x1, y1 = self.bounds
+        best_d2, best_i, best = infinity, None, None
+        for r in range(max(cx - x0, x1 - cx, cy - y0, y1 - cy) + 1):
+            for cell in self.ring(cx, cy, r):
+                for i, item, x, y in self.buckets.get(cell, ()):
+                    d2 = (x - hx)**2 + (y - hy)**2
+                    if (d2 < best_d2 or (d2 == best_d2 and i < best_i)) \
+                           and allowed(item):
+                        best_d2, best_i, best = d2, i, item
+            if best_d2 < (r * self.size) ** 2:
+                break
+        return best
+
+    def ring(self, cx, cy, r):
+        "The buckets at a Chebyshev distance of r from bucket (cx, cy)."
+        if r == 0:
+            return [(cx, cy)]
+        cells = []
+        for dx in range(-r, r + 1):
+            cells.append((cx + dx, cy - r))
+            cells.append((cx + dx, cy + r))
+        for dy in range(-r + 1, r):
+            cells.append((cx - r, cy + dy))
+            cells.append((cx + r, cy + dy))
+        return cells
+
 romania = UndirectedGraph(Dict(
     A=Dict(Z=75, S=140, T=118),
     B=Dict(U=85, P=101, G=90, F=211),
@@ -548,6 +898,41 @@ class GraphProblem(Problem):
         else:
             return infinity
 
+    def goal_states(self):
+        "The states that pass the goal test."
+        return [self.goal]
+
+    def reverse(self):
+        """The problem of getting back from the goal to the initial node, on
+        the inverse graph; the backward half of a bidirectional search."""
+        return GraphProblem(self.goal, self.initial, self.graph.inverse())
+
+class MultiGoalGraphProblem(GraphProblem):
+    """The problem of searching a graph from one node to the nearest of
+    several goal nodes.  The h function is the straight-line distance to
+    the nearest goal, so astar_search (like uniform_cost_search) stops at
+    the nearest goal; bidirectional_astar_search searches backward from
+    all the goals at once."""
+    def __init__(self, initial, goals, graph):
+        GraphProblem.__init__(self, initial, None, graph)
+        self.goals = list(goals)
+        self.goal_set = set(self.goals)
+
+    def goal_test(self, state):
+        return state in self.goal_set
+
+    def h(self, node):
+        "h function is straight-line distance to the nearest goal."
+        locs = getattr(self.graph, 'locations', None)
+        if locs:
+            here = locs[node.state]
+            return min(int(distance(here, locs[goal])) for goal in self.goals)
+        else:
+            return infinity
+
+    def goal_states(self):
+        return self.goals
+
 #______________________________________________________________________________
 
 class NQueensProblem(Problem):
@@ -591,6 +976,10 @@ class NQueensProblem(Problem):
                 or row1-col1 == row2-col2  ## same \ diagonal
                 or row1+col1 == row2+col2) ## same / diagonal
 
+    def h(self, node):
+        "h function is the number of columns not yet filled in."
+        return node.state.count(None)
+
     def goal_test(self, state):
         "Check if all columns filled, no conflicts."
         if state[-1] is None:
@@ -598,6 +987,148 @@ class NQueensProblem(Problem):
         return not any(self.conflicted(state, state[col], col)
                        for col in range(len(state)))
 
+class NQueensRepairProblem(Problem):
+    """N-Queens as a local search (iterative repair) problem: a state is a
+    complete board, a list of N rows that is a permutation, one queen per
+    row and column, and an action (col1, col2) swaps the rows of the queens
+    in two columns, so only diagonal attacks can arise.  The problem keeps
+    the number of queens on each row and each diagonal in arrays, so asking
+    how many queens attack a square, and making a move, take constant time.
+    There is only ever the one board: result() moves the queens in place
+    and returns the same list.  The initial board is built greedily, each
+    queen going on the first of a few free rows sampled that has clear
+    diagonals.
+    >>> p = NQueensRepairProblem(8, [0, 1, 2, 3, 4, 5, 6, 7])
+    >>> p.attacks, p.conflicts(p.initial, 0, 0), p.conflicts(p.initial, 0, 1)
+    (28, 7, 1)
+    >>> p.goal_test(p.result(p.initial, (0, 5)))
+    False
+    >>> p.attacks, p.initial[:6]
+    (16, [5, 1, 2, 3, 4, 0])
+    """
+
+    def __init__(self, N, initial=None, samples=50):
+        update(self, N=N, samples=samples, attacks=0, rows=[0] * N,
+               downs=[0] * (2 * N - 1), ups=[0] * (2 * N - 1))
+        if initial is None:
+            initial = self.greedy_board()
+        self.initial = list(initial)
+        for col, row in enumerate(self.initial):
+            self.add(col, row)
+
+    def greedy_board(self):
+        "A permutation of the rows with few queens sharing a diagonal."
+        N, free, uniform = self.N, range(self.N), random.random
+        downs, ups = [False] * (2 * N - 1), [False] * (2 * N - 1)
+        board = []
+        for col in xrange(N):
+            for k in xrange(min(self.samples, len(free))):
+                i = int(uniform() * len(free))
+                row = free[i]
+                if not (downs[row - col + N - 1] or ups[row + col]):
+                    break
+            free[i] = free[-1]
+            free.pop()
+            downs[row - col + N - 1] = ups[row + col] = True
+            board.append(row)
+        return board
+
+    def add(self, col, row, d=1):
+        "Count (d=1) or uncount (d=-1) a queen at (col, row)."
+        down, up = row - col + self.N - 1, row + col
+        if d < 0:
+            self.rows[row] -= 1; self.downs[down] -= 1; self.ups[up] -= 1
+        self.attacks += d * (self.rows[row] + self.downs[down] + self.ups[up])
+        if d > 0:
+            self.rows[row] += 1; self.downs[down] += 1; self.ups[up] += 1
+
+    def conflicts(self, state, col, row):
+        "The number of other queens attacking square (col, row)."
+        n = (self.rows[row] + self.downs[row - col + self.N - 1]
+             + self.ups[row + col])
+        if state[col] == row:
+            n -= 3
+        return n
+
+    def attacked(self, state):
+        "The columns whose queens are under attack."
+        N, rows, downs, ups = self.N, self.rows, self.downs, self.ups
+        return [col for col in xrange(N)
+                if (rows[state[col]] > 1 or downs[state[col] - col + N - 1] > 1
+                    or ups[state[col] + col] > 1)]
+
+    def actions(self, state):
+        "All the swaps of the rows of two queens."
+        return [(col1, col2) for col1 in range(self.N)
+                for col2 in range(col1 + 1, self.N)]
+
+    def result(self, state, (col1, col2)):
+        row1, row2 = state[col1], state[col2]
+        self.add(col1, row1, -1)
+        self.add(col2, row2, -1)
+        state[col1], state[col2] = row2, row1
+        self.add(col1, row2)
+        self.add(col2, row1)
+        return state
+
+    def value(self, state):
+        "Minus the number of pairs of queens attacking each other."
+        return -self.attacks
+
+    def goal_test(self, state):
+        return self.attacks == 0
+
+def min_conflicts_nqueens(problem, max_steps=None):
+    """Min-conflicts local search for an NQueensRepairProblem: take a queen
+    under attack and swap it with one of a few other queens sampled at
+    random, keeping the first swap that lowers the number of attacks; when a
+    whole pass over the attacked queens improves nothing, make a random swap
+    anyway to get out of the local minimum.  The queens under attack are
+    found by a scan of the board, repeated only when the ones from the last
+    scan have all been dealt with.  Returns the solved board, or None after
+    max_steps swaps, counting the escapes and the swaps that undo a failed
+    trial (default 20N, and at least 20000).
+    >>> p = InstrumentedProblem(NQueensRepairProblem(1000))
+    >>> NQueensProblem(1000).goal_test(min_conflicts_nqueens(p))
+    True
+    >>> p.goal_tests > 0 and p.states > 0
+    True
+    """
+    N, state = problem.N, problem.initial
+    max_steps = if_(max_steps is None, max(20 * N, 20000), max_steps)
+    attacked, steps, improved = [], 0, True
+    while not problem.goal_test(state):
+        if not attacked:
+            attacked = problem.attacked(state)
+            random.shuffle(attacked)
+            if not improved:
+                if steps == max_steps:
+                    return None
+                steps += 1
+                state = problem.result(state, (attacked[-1], random.randrange(N)))
+            improved = False
+        col = attacked.pop()
+        if not problem.conflicts(state, col, state[col]):
+            continue
+        for k in range(min(problem.samples, 2 * N)):
+            if steps == max_steps:
+                return None
+            steps += 1
+            other = random.randrange(N)
+            before = problem.attacks
+            state = problem.result(state, (col, other))
+            if problem.attacks < before:
+                improved = True
+                for c in (col, other):
+                    if problem.conflicts(state, c, state[c]):
+                        attacked.append(c)
+                break
+            if steps == max_steps:
+                return None
+            steps += 1
+            state = problem.result(state, (col, other))
+    return state
+
 #______________________________________________________________________________
 # Inverse Boggle: Search for a high-scoring Boggle board. A good domain for
 # iterative-repair and related search techniques, as suggested by Justin Boyan.
@@ -630,11 +1161,10 @@ def print_boggle(board):
         else: print str(board[i]) + ' ',
     print
 
-def boggle_neighbors(n2, cache={}):
+def boggle_neighbors(n2):
     """Return a list of lists, where the i-th element is the list of indexes
-    for the neighbors of square i."""
-    if cache.get(n2):
-        return cache.get(n2)
+    for the neighbors of square i.  The lists for the few most recent board
+    sizes are remembered."""
     n = exact_sqrt(n2)
     neighbors = [None] * n2
     for i in range(n2):
@@ -653,9 +1183,10 @@ def boggle_neighbors(n2, cache={}):
             if not on_right: neighbors[i].append(i + n + 1)
         if not on_left: neighbors[i].append(i - 1)
         if not on_right: neighbors[i].append(i + 1)
-    cache[n2] = neighbors
     return neighbors
 
+boggle_neighbors = memoize(boggle_neighbors, maxsize=8)
+
 def exact_sqrt(n2):
     "If n2 is a perfect square, return its square root, else raise error."
     n = int(math.sqrt(n2))
@@ -667,9 +1198,14 @@ def exact_sqrt(n2):
 class Wordlist:
     """This class holds a list of words. You can use (word in wordlist)
     to check if a word is in the list, or wordlist.lookup(prefix)
-    to see if prefix starts any of the words in the list."""
+    to see if prefix starts any of the words in the list.  The words are
+    read from the file filename, or taken from filename if it is a list.
+    wordlist.dawg() is the same words as a DAWG, for BoggleFinder."""
     def __init__(self, filename, min_len=3):
-        lines = open(filename).read().upper().split()
+        if isinstance(filename, list):
+            lines = [word.upper() for word in filename]
+        else:
+            lines = open(filename).read().upper().split()
         self.words = [word for word in lines if len(word) >= min_len]
         self.words.sort()
         self.bounds = {}
@@ -697,16 +1233,105 @@ class Wordlist:
     def __len__(self):
         return len(self.words)
 
+    def dawg(self):
+        "The words as a DAWG, built the first time it is asked for."
+        if not hasattr(self, 'graph'):
+            self.graph = DAWG(self.words)
+        return self.graph
+
+letter_codes = dict((c, k) for k, c in enumerate(ALPHABET))
+
+class DAWG:
+    """A directed acyclic word graph: a trie of the words in which equal
+    subtrees are shared, stored in two flat arrays.  Node 0 is the root, and
+    next[26*node + k] is the node reached from node by the k-th letter of
+    ALPHABET (0 for none, as the root is nobody's child), so each step is a
+    single array index.  final[node] is 1 if the path to node spells a word.
+    Words with characters outside ALPHABET are left out.
+    >>> d = DAWG(['CAT', 'CATS', 'DOG', 'DOGS', "DON'T"])
+    >>> len(d), d.walk('CAT') == d.walk('DOG'), d.walk('CA'), d.walk('COW')
+    (7, True, 3, None)
+    >>> [d.final[d.walk(w)] for w in ['DO', 'DOGS']]
+    [0, 1]
+    """
+
+    def __init__(self, words):
+        words = sorted(set(w for w in words
+                           if all(c in letter_codes for c in w)))
+        edges, final = [{}], [False]     # the trie as it is built
+        register = {}                    # signature -> node, for sharing
+        unchecked = []                   # (parent, letter, child) to share
+        def share(down_to):
+            while len(unchecked) > down_to:
+                parent, letter, child = unchecked.pop()
+                signature = (final[child], tuple(sorted(edges[child].items())))
+                if signature in register:
+                    edges[parent][letter] = register[signature]
+                else:
+                    register[signature] = child
+        previous = ''
+        for word in words:
+            common = 0
+            while (common < min(len(word), len(previous))
+                   and word[common] == previous[common]):
+                common += 1
+            share(common)
+            node = if_(unchecked, lambda: unchecked[-1][2], 0)
+            for letter in word[common:]:
+                edges.append({})
+                final.append(False)
+                edges[node][letter] = len(edges) - 1
+                unchecked.append((node, letter, len(edges) - 1))
+                node = len(edges) - 1
+            final[node] = True
+            previous = word
+        share(0)
+        ## Number the shared nodes that are left, and fill in the arrays.
+        number, order = {0: 0}, [0]
+        for node in order:
+            for child in edges[node].values():
+                if child not in number:
+                    number[child] = len(order)
+                    order.append(child)
+        self.next = array('i', [0]) * (26 * len(order))
+        self.final = array('b', [final[node] for node in order])
+        for node in order:
+            base = 26 * number[node]
+            for letter, child in edges[node].items():
+                self.next[base + letter_codes[letter]] = number[child]
+
+    def __len__(self):
+        "The number of nodes."
+        return len(self.final)
+
+    def step(self, node, c):
+        "The node reached from node by the letter c (0 if none)."
+        return self.next[26 * node + letter_codes[c]]
+
+    def walk(self, word, node=0):
+        "The node reached from node by the letters of word, or None."
+        for c in word:
+            node = self.step(node, c)
+            if not node: return None
+        return node
+
 #_____________________________________________________________________________
 
 class BoggleFinder:
-    """A class that allows you to find all the words in a Boggle board. """
+    """A class that allows you to find all the words in a Boggle board.
+    The words are found by walking the DAWG of the wordlist along the paths
+    of the board.  An incremental finder also remembers, for each square,
+    every path that ends there and every word found through it, so that
+    changes(i, c) can tell which words changing square i to c would gain
+    and lose by exploring only the paths through square i."""
 
     wordlist = None ## A class variable, holding a wordlist
 
-    def __init__(self, board=None):
+    def __init__(self, board=None, incremental=False):
         if BoggleFinder.wordlist is None:
             BoggleFinder.wordlist = Wordlist("../data/EN-text/wordlist")
+        self.dawg = self.wordlist.dawg()
+        self.incremental = incremental
         self.found = {}
         if board:
             self.set_board(board)
@@ -718,28 +1343,70 @@ class BoggleFinder:
         self.board = board
         self.neighbors = boggle_neighbors(len(board))
         self.found = {}
+        if self.incremental:
+            self.counts = {} # number of paths spelling each word
+            self.through = [[] for i in board] # words on paths through i
+            self.ends = [[] for i in board] # (node, visited, prefix) ending at i
         for i in range(len(board)):
-            lo, hi = self.wordlist.bounds[board[i]]
-            self.find(lo, hi, i, [], '')
+            self.find(0, i, 0, '', self.found, self.incremental)
         return self
 
-    def find(self, lo, hi, i, visited, prefix):
+    def find(self, node, i, visited, prefix, found, record=False):
         """Looking in square i, find the words that continue the prefix,
-        considering the entries in self.wordlist.words[lo:hi], and not
-        revisiting the squares in visited."""
-        if i in visited:
+        which led to node of the DAWG, and not revisiting the squares in
+        visited (a bit mask).  Words go in the dict found; if record is
+        true, paths and words are also recorded for changes()."""
+        bit = 1 << i
+        if visited & bit:
+            return
+        c = self.board[i]
+        arcs = self.dawg.next
+        node = arcs[26 * node + letter_codes[c]]
+        if c == 'Q' and node:
+            c = 'QU'
+            node = arcs[26 * node + letter_codes['U']]
+        if not node:
             return
-        wordpos, is_word = self.wordlist.lookup(prefix, lo, hi)
-        if wordpos is not None:
-            if is_word:
-                self.found[prefix] = True
-            visited.append(i)
-            c = self.board[i]
-            if c == 'Q': c = 'QU'
-            prefix += c
+        visited |= bit
+        prefix += c
+        if record:
+            self.ends[i].append((node, visited, prefix))
+        ## A word only counts if its path could go on to another square
+        ## (as it always has: words were recorded one square further on).
+        if self.dawg.final[node] and any(not visited & (1 << j)
+                                         for j in self.neighbors[i]):
+            found[prefix] = True
+            if record:
+                self.counts[prefix] = self.counts.get(prefix, 0) + 1
+                for j in range(len(self.board)):
+                    if visited & (1 << j):
+                        self.through[j].append(prefix)
+        for j in self.neighbors[i]:
+            self.find(node, j, visited, prefix, found, record)
+
+    def changes(self, i, c):
+        """Return the sets of words (gained, lost) by changing square i of
+        the board to letter c, without changing anything.  A word is lost if
+        every path that spells it goes through square i; the paths through i
+        after the change are found by extending every path that ends next to
+        i (and the empty path) into i.  Needs an incremental finder."""
+        tally = {}
+        for word in self.through[i]:
+            tally[word] = tally.get(word, 0) + 1
+        doomed = [word for word, n in tally.items() if self.counts[word] == n]
+        new, bit, old = {}, 1 << i, self.board[i]
+        self.board[i] = c
+        try:
+            self.find(0, i, 0, '', new)
             for j in self.neighbors[i]:
-                self.find(wordpos, hi, j, visited, prefix)
-            visited.pop()
+                for node, visited, prefix in self.ends[j]:
+                    if not visited & bit:
+                        self.find(node, i, visited, prefix, new)
+        finally:
+            self.board[i] = old
+        gained = set(word for word in new if word not in self.found)
+        lost = set(word for word in doomed if word not in new)
+        return gained, lost
 
     def words(self):
         "The words found."
@@ -757,18 +1424,28 @@ class BoggleFinder:
 
 #_____________________________________________________________________________
 
-def boggle_hill_climbing(board=None, ntimes=100, verbose=True):
+def boggle_hill_climbing(board=None, ntimes=100, verbose=True,
+                         incremental=True):
     """Solve inverse Boggle by hill-climbing: find a high-scoring board by
-    starting with a random one and changing it."""
-    finder = BoggleFinder()
+    starting with a random one and changing it.  With incremental, each
+    change is scored by BoggleFinder.changes, and the board is only searched
+    again in full when a change is kept."""
+    finder = BoggleFinder(incremental=incremental)
     if board is None:
         board = random_boggle()
     best = len(finder.set_board(board))
     for _ in range(ntimes):
         i, oldc = mutate_boggle(board)
-        new = len(finder.set_board(board))
+        if incremental:
+            newc, board[i] = board[i], oldc
+            gained, lost = finder.changes(i, newc)
+            new = best + len(gained) - len(lost)
+            board[i] = newc
+        else:
+            new = len(finder.set_board(board))
         if new > best:
             best = new
+            if incremental: finder.set_board(board)
             if verbose: print best, _, board
         else:
             board[i] = oldc ## Change back
@@ -850,6 +1527,261 @@ recursive_best_first_search   <   5/   6/  15/B>   <5887/5888/16532/N>   <  11/
                                 GraphProblem('Q', 'WA', australia)],
             header=['Searcher', 'Romania(A, B)', 'Romania(O, N)', 'Australia'])
 
+# Benchmarking: run each (searcher, problem) cell of a comparison in its own
+# forked process, a few at a time, with a time limit per cell, and record
+# its statistics as a dict, ready for print_benchmark or a CSV/JSON file.
+
+benchmark_fields = ['searcher', 'problem', 'status', 'seconds', 'succs',
+                    'goal_tests', 'states', 'expansions_per_sec', 'memory_kb',
+                    'length', 'cost', 'found', 'error']
+
+def labelled(items):
+    "Pair each item with a label: (label, item) pairs are kept as they are."
+    return [if_(isinstance(item, tuple), item, (name(item), item))
+            for item in items]
+
+def proc_status_kb(field):
+    "The value in KB of field (such as 'VmRSS') of /proc/self/status, or None."
+    try:
+        for line in open('/proc/self/status'):
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    except IOError:
+        return None
+
+def reset_peak_rss():
+    """Reset the peak resident size of this process to its current size, as
+    Linux allows, and return that size in KB; None if it can't be done."""
+    try:
+        clear_refs = open('/proc/self/clear_refs', 'w')
+        clear_refs.write('5')
+        clear_refs.close()
+    except IOError:
+        return None
+    return proc_status_kb('VmRSS')
+
+def run_cell(searcher, problem, reset_peak=False):
+    """Run searcher on an InstrumentedProblem and return its statistics.
+    With reset_peak (as benchmark_searchers does, in the forked child that
+    runs the cell), memory_kb is the search's own peak memory: how far the
+    peak resident size rose above the resident size at the start of the
+    search, with the process's peak reset then (so memory used before, such
+    as a forked parent's, is not counted).  Otherwise, or where the peak
+    can't be reset, it is the growth of the lifetime peak, which misses a
+    search that stays below it."""
+    p = InstrumentedProblem(problem)
+    baseline = reset_peak and reset_peak_rss()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    node = searcher(p)
+    seconds = time.time() - start
+    if baseline:
+        memory_kb = proc_status_kb('VmHWM') - baseline
+    else:
+        memory_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    return dict(status=if_(node, 'ok', 'failed'), seconds=seconds,
+                succs=p.succs, goal_tests=p.goal_tests, states=p.states,
+                expansions_per_sec=p.succs / max(seconds, 1e-9),
+                memory_kb=memory_kb,
+                length=node and len(node.solution()),
+                cost=node and node.path_cost,
+                found=node and str(node.state))
+
+def _benchmark_child(send, searcher, problem):
+    try:
+        send.send(run_cell(searcher, problem, reset_peak=True))
+    except Exception, e:
+        send.send(dict(status='error', error=repr(e)))
+    send.close()
+
+def benchmark_searchers(problems, searchers, timeout=60, processes=None,
+                        csv_file=None, json_file=None):
+    """Run every searcher on every problem, each in its own forked process
+    (so the problems and searchers need not be picklable), with at most
+    processes (default: the number of CPUs) running at once.  A cell still
+    running after timeout seconds is killed, with status 'timeout'.  Either
+    list may hold (label, item) pairs.  Returns a list of dicts, one per
+    cell, with the keys in benchmark_fields; these are also written to
+    csv_file and json_file if given."""
+    problems, searchers = labelled(problems), labelled(searchers)
+    cells = [(s, p) for s in searchers for p in problems]
+    results = [None] * len(cells)
+    processes = processes or multiprocessing.cpu_count()
+    running = {}
+    i = 0
+    while i < len(cells) or running:
+        while i < len(cells) and len(running) < processes:
+            (_, searcher), (_, problem) = cells[i]
+            recv, send = multiprocessing.Pipe(duplex=False)
+            proc = multiprocessing.Process(target=_benchmark_child,
+                                           args=(send, searcher, problem))
+            proc.daemon = True
+            start = time.time()
+            proc.start()
+            send.close()
+            running[i] = (proc, recv, start)
+            i += 1
+        time.sleep(0.01)
+        for j, (proc, recv, start) in running.items():
+            result = None
+            if recv.poll():
+                try:
+                    result = recv.recv()
+                except EOFError: # died without a word
+                    result = dict(status='error', error='died')
+            elif time.time() - start > timeout:
+                proc.terminate()
+                result = dict(status='timeout', seconds=time.time() - start)
+            if result is not None:
+                proc.join()
+                recv.close()
+                (s_label, _), (p_label, _) = cells[j]
+                result.update(searcher=s_label, problem=p_label)
+                results[j] = dict((f, result.get(f)) for f in benchmark_fields)
+                del running[j]
+    if csv_file:
+        write_benchmark_csv(results, csv_file)
+    if json_file:
+        write_benchmark_json(results, json_file)
+    return results
+
+def write_benchmark_csv(results, filename):
+    "Write benchmark_searchers results as CSV, one row per cell."
+    out = open(filename, 'wb')
+    writer = csv.DictWriter(out, benchmark_fields)
+    writer.writeheader()
+    writer.writerows(results)
+    out.close()
+
+def write_benchmark_json(results, filename):
+    "Write benchmark_searchers results as a JSON list of objects."
+    out = open(filename, 'w')
+    json.dump(results, out, indent=1, sort_keys=True)
+    out.close()
+
+def print_benchmark(results, fields=['seconds', 'succs', 'expansions_per_sec',
+                                     'memory_kb', 'cost']):
+    """Print benchmark_searchers results as a table with a row per cell.
+    >>> results = benchmark_searchers([GraphProblem('A', 'B', romania)],
+    ...                               [breadth_first_search,
+    ...                                ('ucs', uniform_cost_search)])
+    >>> [(r['searcher'], r['status'], r['succs'], r['cost']) for r in results]
+    [('breadth_first_search', 'ok', 7, 450), ('ucs', 'ok', 12, 418)]
+    """
+    table = [[r['searcher'], r['problem'], r['status']] +
+             [if_(r[f] is None, '-', r[f]) for f in fields] for r in results]
+    print_table(table, ['Searcher', 'Problem', 'Status'] + fields,
+                numfmt='%.4g')
+
+def scanning(queue_class):
+    """A subclass of queue_class whose 'in' test scans the queue, as the
+    queues did before they counted their items; for compare_frontiers."""
+    class ScanningQueue(queue_class):
+        def __contains__(self, item):
+            return item in self.items()
+    ScanningQueue.__name__ = 'Scanning' + queue_class.__name__
+    return ScanningQueue
+
+def compare_frontiers(sizes=(1000, 10000, 100000), min_links=4, repeat=1,
+                      scan_max=10000):
+    """Time graph searches of RandomGraphs of each size in sizes (on a square
+    big enough to keep the cities apart) with the frontier queues, whose
+    'in' test is a dict lookup, against the same queues with a scanning
+    'in' test.  Prints the seconds taken and the speedup.  The scanning
+    queues take quadratic time, so they are only timed up to scan_max
+    cities."""
+    frontiers = [(Stack, ()), (FIFOQueue, ()),
+                 (PriorityQueue, (min, lambda node: node.path_cost))]
+    def timed(problem, queue_class, args):
+        start = time.time()
+        for i in range(repeat):
+            graph_search(problem, queue_class(*args))
+        return time.time() - start
+    table = []
+    for n in sizes:
+        side = int(math.sqrt(4 * n)) + 1
+        problem = GraphProblem(0, n - 1, RandomGraph(range(n), min_links,
+                                                     side, side))
+        for queue_class, args in frontiers:
+            indexed = timed(problem, queue_class, args)
+            if n <= scan_max:
+                scan = timed(problem, scanning(queue_class), args)
+                table.append([queue_class.__name__, str(n), indexed, scan,
+                              scan / max(indexed, 1e-9)])
+            else:
+                table.append([queue_class.__name__, str(n), indexed, '-', '-'])
+    print_table(table, ['graph_search', 'Cities', 'Indexed(s)',
+                        'Scanning(s)', 'Speedup'], numfmt='%.4g')
+
+def dict_node_class():
+    """A class of search nodes that keep their fields in a __dict__, as
+    Node did before it had __slots__; for compare_node_allocation."""
+    class DictNode:
+        def __init__(self, state, parent=None, action=None, path_cost=0):
+            update(self, state=state, parent=parent, action=action,
+                   path_cost=path_cost, depth=0)
+            if parent:
+                self.depth = parent.depth + 1
+        def solution(self):
+            node, path_back = self, []
+            while node:
+                path_back.append(node)
+                node = node.parent
+            return [node.action for node in list(reversed(path_back))[1:]]
+    return DictNode
+
+def node_bytes(node):
+    "The bytes taken by node itself and its __dict__, if it has one."
+    size = sys.getsizeof(node)
+    if hasattr(node, '__dict__'):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+def compare_node_allocation(n=1000000):
+    """Build a chain of n search nodes (each with f and h set, as astar_search
+    leaves them) with Node and with a __dict__-based node class, and print
+    the seconds taken, the bytes per node and the seconds for solution()."""
+    table = []
+    for node_class in [Node, dict_node_class()]:
+        start = time.time()
+        node = node_class(0)
+        for i in xrange(1, n):
+            node = node_class(i, node, i, i)
+            node.f = node.h = 0
+        built = time.time() - start
+        start = time.time()
+        node.solution()
+        table.append([node_class.__name__, built, node_bytes(node),
+                      time.time() - start])
+        del node
+    print_table(table, ['%d nodes' % n, 'Build(s)', 'Bytes/node',
+                        'solution()(s)'], numfmt='%.4g')
+
+def compare_route_searchers(n=100000, min_links=4, ngoals=10,
+                            searchers=[uniform_cost_search, astar_search,
+                                       bidirectional_uniform_cost_search,
+                                       bidirectional_astar_search]):
+    """Build a RandomGraph of n cities (on a square big enough to keep the
+    cities apart) and time each searcher on a route across it, and on the
+    route to the nearest of ngoals random goals.  Prints seconds and costs."""
+    side = int(math.sqrt(4 * n)) + 1
+    start = time.time()
+    graph = RandomGraph(range(n), min_links, side, side)
+    print 'Built %d cities in %.3g seconds' % (n, time.time() - start)
+    problems = [GraphProblem(0, n - 1, graph),
+                MultiGoalGraphProblem(0, random.sample(range(1, n), ngoals),
+                                      graph)]
+    table = []
+    for searcher in searchers:
+        row = [name(searcher)]
+        for problem in problems:
+            start = time.time()
+            node = searcher(problem)
+            row += [time.time() - start, node and node.path_cost]
+        table.append(row)
+    print_table(table, ['Searcher', 'Route(s)', 'Cost',
+                        'Nearest of %d(s)' % ngoals, 'Cost'], numfmt='%.4g')
+
 #______________________________________________________________________________
 
 __doc__ += """
@@ -870,6 +1802,40 @@ __doc__ += """
 ['S', 'R', 'P', 'B']
 >>> recursive_best_first_search(ab).solution()
 ['S', 'R', 'P', 'B']
+>>> ida_star_search(ab).solution()
+['S', 'R', 'P', 'B']
+>>> iterative_rbfs_search(ab).solution()
+['S', 'R', 'P', 'B']
+>>> ida_star_search(NQueensProblem(8))
+<Node [0, 4, 7, 5, 2, 6, 1, 3]>
+>>> islands = GraphProblem('A', 'D', UndirectedGraph(dict(A=dict(B=1), C=dict(D=1))))
+>>> iterative_rbfs_search(islands, lambda n: 0), ida_star_search(islands, lambda n: 0)
+(None, None)
+>>> bidirectional_astar_search(ab).solution()
+['S', 'R', 'P', 'B']
+>>> bidirectional_uniform_cost_search(ab).path_cost
+418
+>>> bidirectional_astar_search(GraphProblem('A', 'A', romania)).solution()
+[]
+>>> nearest = MultiGoalGraphProblem('A', ['B', 'O', 'C'], romania)
+>>> astar_search(nearest).solution()
+['Z', 'O']
+>>> bidirectional_astar_search(nearest).solution()
+['Z', 'O']
+>>> one_way = Graph(dict(A=dict(B=1), B=dict(C=1), C=dict(A=1)))
+>>> bidirectional_uniform_cost_search(GraphProblem('A', 'C', one_way)).solution()
+['B', 'C']
+
+# An admissible heuristic that is not consistent: h(A) = 4 > h(C) + 1.
+>>> detour = UndirectedGraph(dict(S=dict(A=1, B=1), C=dict(A=1, B=3, G=3)))
+>>> h = dict(S=0, A=4, B=1, C=0, G=0)
+>>> astar_search(GraphProblem('S', 'G', detour), lambda n: h[n.state]).path_cost
+7
+>>> stats = {}
+>>> node = astar_search(GraphProblem('S', 'G', detour), lambda n: h[n.state],
+...                     tie='high_g', reopen=True, stats=stats)
+>>> node.solution(), node.path_cost, stats['reopened'], stats['expanded']
+(['A', 'C', 'G'], 5, 1, 5)
 
 >>> board = list('SARTELNID')
 >>> print_boggle(board)
@@ -0,0 +1,179 @@
+# solver_trace.py
+# ---------------
+# Licensing Information:
+# Please DO NOT DISTRIBUTE OR PUBLISH solutions to this project.
+# You are free to use and extend these projects for EDUCATIONAL PURPOSES ONLY.
+# The Hunt The Wumpus AI project was developed at University of Arizona
+# by Clay Morrison (clayton@sista.arizona.edu), spring 2013.
+# This project extends the python code provided by Peter Norvig as part of
+# the Artificial Intelligence: A Modern Approach (AIMA) book example code;
+# see http://aima.cs.berkeley.edu/code.html
+# In particular, the following files come directly from the AIMA python
+# code: ['agents.py', 'logic.py', 'search.py', 'utils.py']
+# ('logic.py' has been modified by Clay Morrison in locations with the
+# comment 'CTM')
+# The file ['minisat.py'] implements a slim system call wrapper to the minisat
+# (see http://minisat.se) SAT solver, and is directly based on the satispy
+# python project, see https://github.com/netom/satispy .
+
+"""Instrumentation for the SAT-backed knowledge base.
+
+Every PropKB_SAT.ask and every Minisat.solve can be recorded in an in-memory
+ring buffer, together with the agent phase that issued it (e.g.
+'find_OK_locations'), the clause and variable counts, the time spent
+serializing the clauses to DIMACS, the time spent in the solver, and the
+result.  The buffer can be written out as JSON lines, or as a Chrome trace
+(load it in chrome://tracing or https://ui.perfetto.dev) so that a whole game
+can be viewed as a flame graph.
+
+Tracing is off by default; turn it on with TRACE.enabled = True (or with
+the --trace option of wumpus.py).
+
+>>> t = SolverTrace(capacity=2)
+>>> with t.phase('find_OK_locations', t=3):
+...     t.record('ask', 0.0, 0.5, query='OK1_1_3', result=True)
+>>> t.records[0]['phase'], t.records[0]['t']
+('find_OK_locations', 3)
+>>> t.records[1]['kind'], t.records[1]['name']
+('phase', 'find_OK_locations')
+>>> for i in range(5): t.record('solve', 0.0, 0.1)
+>>> len(t.records)
+2
+"""
+
+import json
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer as timer
+
+#-------------------------------------------------------------------------------
+
+class SolverTrace(object):
+    """A bounded buffer of solver events.  Each event is a dict with at least
+    the keys 'kind', 'phase', 'start' and 'dur' (seconds, relative to the
+    creation of the trace); the remaining keys depend on the kind of event."""
+
+    def __init__(self, capacity=100000, enabled=True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.records = deque(maxlen=capacity)
+        self.phases = []   # stack of (name, context) pairs
+        self.origin = timer()
+
+    def clear(self):
+        self.records.clear()
+        self.origin = timer()
+
+    def current_phase(self):
+        "The name of the innermost active phase, or None."
+        if self.phases:
+            return self.phases[-1][0]
+        return None
+
+    @contextmanager
+    def phase(self, name, **context):
+        """Mark everything recorded inside the with-block as issued by phase
+        <name>.  Extra keyword arguments (e.g. t=time) are copied into every
+        record made inside the block.  The phase itself is also recorded, so
+        that solver calls nest under it in the Chrome trace."""
+        self.phases.append((name, context))
+        start = timer()
+        try:
+            yield
+        finally:
+            self.phases.pop()
+            if self.enabled:
+                self.record('phase', start, timer(), name=name, **context)
+
+    def record(self, kind, start, end, **fields):
+        "Record an event of <kind> that ran from timer() values start to end."
+        if not self.enabled:
+            return
+        rec = {}
+        for _, context in self.phases:
+            rec.update(context)
+        rec.update(fields)
+        rec['kind'] = kind
+        rec['phase'] = self.current_phase()
+        rec['start'] = start - self.origin
+        rec['dur'] = end - start
+        self.records.append(rec)
+
+    def summary(self):
+        """Return a dict mapping (phase, kind) to a dict of totals:
+        count, dur, serialize_time and solve_time."""
+        totals = {}
+        for rec in self.records:
+            key = (rec['phase'], rec['kind'])
+            tot = totals.setdefault(key, dict(count=0, dur=0.0,
+                                              serialize_time=0.0,
+                                              solve_time=0.0))
+            tot['count'] += 1
+            tot['dur'] += rec['dur']
+            tot['serialize_time'] += rec.get('serialize_time', 0.0)
+            tot['solve_time'] += rec.get('solve_time', 0.0)
+        return totals
+
+    def print_summary(self):
+        import utils
+        rows = [[phase or '-', kind, tot['count'], tot['dur'],
+                 tot['serialize_time'], tot['solve_time']]
+                for (phase, kind), tot in sorted(self.summary().items())]
+        if rows:
+            utils.print_table(rows, header=['Phase', 'Kind', 'Count', 'Total(s)',
+                                            'Serialize(s)', 'Solve(s)'],
+                              numfmt='%.4g')
+
+    def to_jsonl(self, filename):
+        "Write one JSON object per recorded event."
+        out = open(filename, 'w')
+        for rec in self.records:
+            out.write(json.dumps(rec, default=str, sort_keys=True))
+            out.write('\n')
+        out.close()
+
+    def to_chrome_trace(self, filename):
+        """Write the events in the Chrome trace-event format, as complete
+        ('X') events on a single thread, so nesting gives the flame graph."""
+        events = []
+        for rec in self.records:
+            args = dict((k, v) for k, v in rec.items()
+                        if k not in ('start', 'dur', 'kind', 'name'))
+            events.append({'name': rec.get('name') or rec.get('query') or rec['kind'],
+                           'cat': rec['kind'],
+                           'ph': 'X',
+                           'ts': rec['start'] * 1e6,
+                           'dur': rec['dur'] * 1e6,
+                           'pid': 1, 'tid': 1,
+                           'args': args})
+        out = open(filename, 'w')
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                  out, default=str)
+        out.close()
+
+    def save(self, filename):
+        "Write the trace, as JSON lines if filename ends in .jsonl, else Chrome."
+        if filename.endswith('.jsonl'):
+            self.to_jsonl(filename)
+        else:
+            self.to_chrome_trace(filename)
+
+## The trace shared by minisat.Minisat and wumpus_agent.PropKB_SAT.
+TRACE = SolverTrace(enabled=False)
+
+def traced_phase(name):
+    """Decorator: run the decorated method inside TRACE.phase(name).
+    If the first argument has a 'time' attribute it is recorded as t."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACE.enabled:
+                return fn(*args, **kwargs)
+            context = {}
+            if args and hasattr(args[0], 'time'):
+                context['t'] = args[0].time
+            with TRACE.phase(name, **context):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
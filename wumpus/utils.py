@@ -22,6 +22,7 @@
 
 from __future__ import generators
 import operator, math, random, copy, sys, os.path, bisect, re
+import collections, inspect
 
 assert (2,5) <= sys.version_info < (3,), """\
 This code is meant for Python 2.5 through 2.7.
@@ -531,7 +532,9 @@ def weighted_sampler(seq, weights):
     totals = []
     for w in weights:
         totals.append(w + totals[-1] if totals else w)
-    return lambda: seq[bisect.bisect(totals, random.uniform(0, totals[-1]))]
+    last = len(seq) - 1
+    return lambda: seq[min(bisect.bisect(totals, random.uniform(0, totals[-1])),
+                           last)]
 
 def num_or_str(x):
     """The argument is a string; convert to a number if possible, or strip it.
@@ -618,26 +621,98 @@ def caller(n=1):
     import inspect
     return inspect.getouterframes(inspect.currentframe())[n][3]
 
-def memoize(fn, slot=None):
+CacheInfo = collections.namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+def memoize(fn, slot=None, maxsize=None):
     """Memoize fn: make it remember the computed value for any argument list.
     If slot is specified, store result in that slot of first argument.
-    If slot is false, store results in a dictionary."""
+    If slot is false, store results in a dictionary, memoized_fn.cache; if
+    maxsize is given, it holds at most maxsize results, and the least
+    recently used one is dropped to make room.  (A slot cache lives and
+    dies with its objects, so maxsize can't be given with a slot.)  A call
+    of a function of exactly one argument, without a default, is keyed on
+    the argument itself rather than on a tuple; keyword arguments are
+    keyed on their sorted items.
+    The memoized function also has cache_info(), a CacheInfo of the hits,
+    misses, maxsize and current size (None for a slot), cache_clear(), and
+    invalidate(*args, **kwargs), which forgets the result for those
+    arguments (for a slot, it deletes the slot of the object)."""
+    if slot and maxsize:
+        raise ValueError('memoize: maxsize does not apply to a slot cache')
+    stats = [0, 0] # hits, misses
     if slot:
         def memoized_fn(obj, *args):
             if hasattr(obj, slot):
+                stats[0] += 1
                 return getattr(obj, slot)
             else:
+                stats[1] += 1
                 val = fn(obj, *args)
                 setattr(obj, slot, val)
                 return val
+        def invalidate(obj, *args):
+            if hasattr(obj, slot):
+                delattr(obj, slot)
+        cache = None
     else:
-        def memoized_fn(*args):
-            if not memoized_fn.cache.has_key(args):
-                memoized_fn.cache[args] = fn(*args)
-            return memoized_fn.cache[args]
-        memoized_fn.cache = {}
+        cache = collections.OrderedDict() if maxsize else {}
+        def key_of(args, kwargs):
+            if one_arg and len(args) == 1 and not kwargs:
+                return args[0]
+            if kwargs:
+                return args + (memoize,) + tuple(sorted(kwargs.items()))
+            return args
+        def lookup(key, args, kwargs):
+            if key in cache:
+                stats[0] += 1
+                if maxsize:
+                    cache[key] = cache.pop(key) ## now most recently used
+                return cache[key]
+            stats[1] += 1
+            val = cache[key] = fn(*args, **kwargs)
+            if maxsize and len(cache) > maxsize:
+                cache.popitem(last=False)
+            return val
+        one_arg = takes_one_arg(fn)
+        if one_arg and not maxsize:
+            def memoized_fn(*args, **kwargs):
+                if len(args) == 1 and not kwargs:
+                    arg = args[0]
+                    if arg in cache:
+                        stats[0] += 1
+                        return cache[arg]
+                    stats[1] += 1
+                    val = cache[arg] = fn(arg)
+                    return val
+                return lookup(key_of(args, kwargs), args, kwargs)
+        else:
+            def memoized_fn(*args, **kwargs):
+                return lookup(key_of(args, kwargs), args, kwargs)
+        def invalidate(*args, **kwargs):
+            cache.pop(key_of(args, kwargs), None)
+        memoized_fn.cache = cache
+    def cache_info():
+        return CacheInfo(stats[0], stats[1], maxsize,
+                         None if cache is None else len(cache))
+    def cache_clear():
+        stats[:] = [0, 0]
+        if cache is not None:
+            cache.clear()
+    memoized_fn.cache_info = cache_info
+    memoized_fn.cache_clear = cache_clear
+    memoized_fn.invalidate = invalidate
     return memoized_fn
 
+def takes_one_arg(fn):
+    "Does fn take exactly one argument, without a default (not counting self)?"
+    try:
+        args, varargs, keywords, defaults = inspect.getargspec(fn)
+    except TypeError: # a builtin, or some other callable
+        return False
+    if inspect.ismethod(fn):
+        args = args[1:]
+    return len(args) == 1 and not varargs and not keywords and not defaults
+
 def if_(test, result, alternative):
     """Like C++ and Java's (test ? result : alternative), except
     both result and alternative are always evaluated. However, if
@@ -736,8 +811,10 @@ class Queue:
         q.pop()         -- return the top item from the queue
         len(q)          -- number of items in q (also q.__len())
         item in q       -- does q contain item?
-    Note that isinstance(Stack(), Queue) is false, because we implement stacks
-    as lists.  If Python ever gets interfaces, Queue will be an interface."""
+    Each queue keeps a count of the items it holds (q.counts), so that
+    'item in q' takes constant time rather than a scan of the queue.  (Search
+    nodes hash by their state.)  Unhashable items, such as nodes whose states
+    are lists, are not counted; 'in' falls back to a scan for those."""
 
     def __init__(self):
         abstract
@@ -745,57 +822,123 @@ class Queue:
     def extend(self, items):
         for item in items: self.append(item)
 
-def Stack():
-    """Return an empty list, suitable as a Last-In-First-Out Queue."""
-    return []
+    def __contains__(self, item):
+        try:
+            return item in self.counts
+        except TypeError:
+            return item in self.items()
+
+    def count_in(self, item):
+        try:
+            self.counts[item] = self.counts.get(item, 0) + 1
+        except TypeError:
+            pass
+
+    def count_out(self, item):
+        try:
+            n = self.counts[item] - 1
+        except TypeError:
+            return
+        if n:
+            self.counts[item] = n
+        else:
+            del self.counts[item]
+
+class Stack(Queue):
+    """A Last-In-First-Out Queue."""
+    def __init__(self):
+        self.A = []; self.counts = {}
+    def append(self, item):
+        self.A.append(item)
+        self.count_in(item)
+    def __len__(self):
+        return len(self.A)
+    def items(self):
+        return self.A
+    def pop(self):
+        e = self.A.pop()
+        self.count_out(e)
+        return e
 
 class FIFOQueue(Queue):
     """A First-In-First-Out Queue."""
     def __init__(self):
-        self.A = []; self.start = 0
+        self.A = []; self.start = 0; self.counts = {}
     def append(self, item):
         self.A.append(item)
+        self.count_in(item)
     def __len__(self):
         return len(self.A) - self.start
-    def extend(self, items):
-        self.A.extend(items)
+    def items(self):
+        return self.A[self.start:]
     def pop(self):
         e = self.A[self.start]
         self.start += 1
         if self.start > 5 and self.start > len(self.A)/2:
             self.A = self.A[self.start:]
             self.start = 0
+        self.count_out(e)
         return e
-    def __contains__(self, item):
-        return item in self.A[self.start:]
 
 class PriorityQueue(Queue):
     """A queue in which the minimum (or maximum) element (as determined by f and
     order) is returned first. If order is min, the item with minimum f(x) is
     returned first; if order is max, then it is the item with maximum f(x).
-    Also supports dict-like lookup."""
+    Also supports dict-like lookup, through an index from each item to
+    its (f(item), item) entries in the queue."""
     def __init__(self, order=min, f=lambda x: x):
-        update(self, A=[], order=order, f=f)
+        update(self, A=[], order=order, f=f, counts={}, index={})
     def append(self, item):
-        bisect.insort(self.A, (self.f(item), item))
+        entry = (self.f(item), item)
+        bisect.insort(self.A, entry)
+        try:
+            self.index.setdefault(item, []).append(entry)
+        except TypeError:
+            pass
+        self.count_in(item)
     def __len__(self):
         return len(self.A)
+    def items(self):
+        return [item for (_, item) in self.A]
     def pop(self):
         if self.order == min:
-            return self.A.pop(0)[1]
+            entry = self.A.pop(0)
         else:
-            return self.A.pop()[1]
-    def __contains__(self, item):
-        return some(lambda (_, x): x == item, self.A)
+            entry = self.A.pop()
+        self.unindex(entry)
+        return entry[1]
     def __getitem__(self, key):
-        for _, item in self.A:
-            if item == key:
-                return item
+        try:
+            entries = self.index.get(key)
+        except TypeError:
+            entries = [e for e in self.A if e[1] == key]
+        if entries:
+            return entries[0][1]
     def __delitem__(self, key):
-        for i, (value, item) in enumerate(self.A):
-            if item == key:
-                self.A.pop(i)
-                return
+        try:
+            entries = self.index.get(key)
+        except TypeError:
+            entries = [e for e in self.A if e[1] == key]
+        if entries:
+            entry = entries[0]
+            i = bisect.bisect_left(self.A, (entry[0],))
+            while self.A[i] is not entry:
+                i += 1
+            self.A.pop(i)
+            self.unindex(entry)
+    def unindex(self, entry):
+        item = entry[1]
+        try:
+            entries = self.index[item]
+        except TypeError:
+            return
+        for i, e in enumerate(entries):
+            if e is entry:
+                del entries[i]
+                break
+        if not entries:
+            del self.index[item]
+        self.count_out(item)
 
 ## Fig: The idea is we can define things like Fig[3,10] later.
 ## Alas, it is Fig[3,10] not Fig[3.10], because that would be the same
@@ -937,6 +1080,27 @@ calculating gnp ...
 >>> fib = memoize(fib)
 >>> fib(9)
 55
+>>> fib.cache_info()
+CacheInfo(hits=7, misses=10, maxsize=None, currsize=10)
+>>> fib.invalidate(9); 9 in fib.cache, 8 in fib.cache
+(False, True)
+
+# A bounded cache forgets the least recently used results:
+>>> square = memoize(lambda x: x * x, maxsize=2)
+>>> square(1), square(2), square(1), square(3)
+(1, 4, 1, 9)
+>>> sorted(square.cache), square.cache_info()
+([1, 3], CacheInfo(hits=1, misses=3, maxsize=2, currsize=2))
+
+# Defaults and keyword arguments work as for the function itself:
+>>> double = memoize(lambda x=3: x * 2)
+>>> double(), double(x=1), double(1), double.cache_info().misses
+(6, 2, 2, 3)
+>>> memoize(fib, 'f', maxsize=10)
+Traceback (most recent call last):
+ValueError: memoize: maxsize does not apply to a slot cache
+>>> gnp.invalidate(countries[0]); countries[0]
+Struct(name='united states')
 
 >>> q = Stack()
 >>> q.append(1)
@@ -950,6 +1114,18 @@ calculating gnp ...
 >>> q.pop(), q.pop()
 (1, 2)
 
+>>> q = PriorityQueue(min, len)
+>>> q.extend(['abc', 'de', 'abc'])
+>>> 'abc' in q, 'xyz' in q
+(True, False)
+>>> q.pop(), 'de' in q, 'abc' in q
+('de', False, True)
+>>> del q['abc']
+>>> 'abc' in q, len(q)
+(True, 1)
+>>> q['abc']
+'abc'
+
 
 >>> abc = set('abc')
 >>> bcd = set('bcd')
@@ -17,6 +17,7 @@
 # python project, see https://github.com/netom/satispy .
 
 from wumpus_agent import *
+from portfolio import Portfolio, make_solver
 from time import clock
 import wumpus_environment
 
@@ -346,6 +347,7 @@ def with_manual_kb_program(agent):
         print "      If the KB is NOT satisfiable, then there's a contradiction that needs fixing."
         print "      NOTE: A satisfiable KB does not mean there aren't other problems."
         print "   Enter 'save-axioms' to save all of the KB axioms to 'kb-axioms.txt'"
+        print "      (as kept by the agent's keep_axioms option)"
         print "      This will overwrite any existing 'kb-axioms.txt'"
         print "   Enter 'save-clauses' to save all of the KB clauses to text file 'kb-clauses.txt'"
         print "      This will overwrite any existing 'kb-clauses.txt'"
@@ -531,6 +533,8 @@ def with_manual_kb_program(agent):
             elif val == 'save-axioms':
                 write_list_to_text_file('kb-axioms.txt',agent.kb.axioms)
                 print "   Saved to 'kb-axioms.txt'"
+                if not agent.kb.axioms:
+                    print "   (No axioms were kept: keep_axioms is off; try 'save-clauses')"
                 print
             elif val == 'save-clauses':
                 write_list_to_text_file('kb-clauses.txt',agent.kb.clauses)
@@ -567,6 +571,7 @@ def with_manual_kb_program(agent):
         return action
 
     agent.program = manual_kb_program
+    agent.keep_axioms = True # for 'save-axioms'
     return agent
 
 #-------------------------------------------------------------------------------
@@ -606,7 +611,7 @@ def run_minisat_test():
         print "Successfully passed {0} tests.".format(len(queries))
     else:
         print "Passed {0} test(s).".format(len(queries) - len(failed))
-        print "The following tests failed: {0}".format(failure)
+        print "The following tests failed: {0}".format(failed)
     print "DONE."
 
 #-------------------------------------------------------------------------------
@@ -643,6 +648,17 @@ def readCommand( argv ):
                       default=False,
                       help=default("Test connection to command-line MiniSat"))
 
+    parser.add_option('--trace', dest='trace', default=None,
+                      help=default("Record every KB query and solver call and write" \
+                                   + " them to this file when the game ends" \
+                                   + " (JSON lines if it ends in .jsonl," \
+                                   + " otherwise a Chrome trace)"))
+
+    parser.add_option('--solver', dest='solver', default='minisat',
+                      help=default("SAT backend(s) used by the hybrid agent's KB;" \
+                                   + " a comma-separated list (of minisat, dpll," \
+                                   + " walksat) is raced as a portfolio"))
+
     options, otherjunk = parser.parse_args(argv)
     
     if len(otherjunk) != 0:
@@ -651,9 +667,12 @@ def readCommand( argv ):
     return options
 
 def run_command(options):
+    if options.trace:
+        TRACE.enabled = True
     if options.test_minisat:
         run_minisat_test()
         return
+    PropKB_SAT.solver = make_solver(options.solver)
     if options.hybrid:
         if options.layout:
             s = world_scenario_hybrid_wumpus_agent_from_layout(options.layout)
@@ -670,6 +689,12 @@ def run_command(options):
         else:
             s = wscenario_4x4_manual()
     s.run()
+    if options.trace:
+        TRACE.save(options.trace)
+        print "Solver trace written to '{0}'".format(options.trace)
+        TRACE.print_summary()
+    if isinstance(PropKB_SAT.solver, Portfolio):
+        PropKB_SAT.solver.print_stats()
 
 #-------------------------------------------------------------------------------
 
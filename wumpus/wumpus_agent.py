@@ -21,7 +21,9 @@ from wumpus_environment import *
 from wumpus_kb import *
 from wumpus_planners import *
 import minisat as msat
+from solver_trace import TRACE, timer, traced_phase
 from time import clock
+from functools import partial
 import sys
 
 
@@ -52,23 +54,134 @@ def minisat(clauses, query = None, variable = None, value = True, verbose = Fals
 #-------------------------------------------------------------------------------
 
 class PropKB_SAT(PropKB):
+    """ A PropKB whose ask() is answered by a SAT solver: any object with
+    the solve(clauses, variable, value) method of minisat.Minisat, such
+    as a portfolio.Portfolio.  The solver shared by all instances can be
+    changed by setting PropKB_SAT.solver.
+
+    The KB also keeps a small pool of models of its clauses: the models
+    found by the solver, and one found by WalkSAT whenever the pool is
+    empty.  A model in which the query is True (or False) already shows
+    that the corresponding solver call would succeed, so that call is
+    skipped; most grid queries (is there a pit at x,y?) have both answers
+    witnessed, and are known to be undecided without calling the solver.
+    Models that do not satisfy newly told clauses are dropped.
+
+    Given a symbol table (wumpus_kb.WumpusSymbolTable) holding every
+    proposition of the KB, the solver numbers the DIMACS variables by it
+    (see minisat.SymbolTableTranslator). """
+
+    solver = msat.Minisat()
+    model_pool_size = 8     # 0 turns model reuse off
+    walksat_flips = 2000    # flips per WalkSAT call seeding the pool; 0 = never
+
+    def __init__(self, sentence = None, solver = None, symbols = None):
+        if solver:
+            self.solver = solver
+        self.symbols = symbols
+        if symbols:
+            self.translator = partial(msat.SymbolTableTranslator, symbols)
+        else:
+            self.translator = msat.AIMA_to_Dimacs_Translator
+        self.models = []
+        self.last_model = None  # warm start for WalkSAT
+        super(PropKB_SAT, self).__init__(sentence)
 
     def tell(self, sentence):
-        if sentence: super(PropKB_SAT,self).tell(sentence)
+        if not sentence: return
+        n = len(self.clauses)
+        super(PropKB_SAT,self).tell(sentence)
+        self.drop_models(self.clauses[n:])
+
+    def tell_clauses(self, clauses):
+        """ Add CNF clauses given as tuples of symbol table ids (negative
+        for a negated symbol), as made by the wumpus_kb clause generators,
+        without parsing or converting any sentence. """
+        symbol = self.symbols.symbol
+        new = []
+        for clause in clauses:
+            literals = [symbol(l) if l > 0 else ~symbol(-l) for l in clause]
+            if len(literals) == 1:
+                new.append(literals[0])
+            else:
+                new.append(Expr('|', *literals))
+        self.clauses.extend(new)
+        self.drop_models(new)
+
+    def drop_models(self, new):
+        " Keep only the pool models that satisfy the new clauses. "
+        if self.models:
+            self.last_model = self.models[-1]
+            self.models = [m for m in self.models
+                           if all(pl_true(c, m) is True for c in new)]
 
     def load_sentences(self, sentences):
         for sentence in sentences: self.tell(sentence)
 
+    def add_model(self, model):
+        if self.model_pool_size:
+            self.models.append(model)
+            del self.models[:-self.model_pool_size]
+
+    def seed_models(self):
+        """ Run WalkSAT, starting from the last model known, to refill
+        the (empty) model pool. """
+        model = WalkSAT(self.clauses, max_flips=self.walksat_flips,
+                        model=self.last_model)
+        if model is not None:
+            self.add_model(model)
+
+    def witnessed(self, query, value):
+        " Is there a model in the pool in which query has this value? "
+        for m in self.models:
+            if m.get(query) == value:
+                return True
+        return False
+
+    def solve(self, query, value):
+        """ Success of the SAT call for clauses + (query = value): True
+        without calling the solver if a known model witnesses it.
+        Return (success, solution or None). """
+        if self.witnessed(query, value):
+            return True, None
+        s = self.solver.solve(self.clauses, query, value, self.translator)
+        if s.success and self.model_pool_size:
+            model = dict(s.varmap)
+            model[query] = value
+            self.add_model(model)
+        return s.success, s
+
     def ask(self, query):
         """ Assumes query is a single positive proposition """
         if isinstance(query,str):
             query = expr(query)
-        sT = minisat(self.clauses, None, variable=query, value=True, verbose=False)
-        sF = minisat(self.clauses, None, variable=query, value=False, verbose=False)
-        if sT.success == sF.success:
-            return None
+        start = timer()
+        if self.clauses and not self.models \
+               and self.model_pool_size and self.walksat_flips:
+            self.seed_models()
+        sT, solT = self.solve(query, True)
+        sF, solF = self.solve(query, False)
+        if sT is None or sF is None or sT == sF:
+            result = None
         else:
-            return sT.success
+            result = sT
+        if TRACE.enabled:
+            self.record_ask(query, result, start, timer(),
+                            [s for s in (solT, solF) if s])
+        return result
+
+    def record_ask(self, query, result, start, end, solutions):
+        """ Add one 'ask' event to the solver trace, totalling the
+        statistics of the minisat calls that answered it """
+        stats = [s.stats for s in solutions if s.stats]
+        TRACE.record('ask', start, end, query=str(query), result=result,
+                     clauses=len(self.clauses),
+                     variables=max([st.get('variables', 0) for st in stats] or [0]),
+                     serialize_time=sum(st.get('serialize_time', 0.0) for st in stats),
+                     solve_time=sum(st.get('solve_time', 0.0) for st in stats),
+                     solver_calls=len(stats),
+                     backend='/'.join(str(st['backend']) for st in stats
+                                      if 'backend' in st) or None)
 
 #-------------------------------------------------------------------------------
 
@@ -88,8 +201,19 @@ class Proposition(agents.Thing):
 
 class HybridWumpusAgent(Explorer):
     "An agent for the wumpus world that does logical inference. [Fig. 7.19]"""
-    def __init__(self, heading='east', environment=None, verbose=True, keep_axioms=True):
-        self.keep_axioms = keep_axioms # for debugging: if True, keep easier-to-read PL form
+
+    # If True, the KB is told the clauses of the wumpus_kb clause generators;
+    # if False, the axiom strings, which it parses and converts to CNF.  If
+    # True, the strings are only built when keep_axioms asks for them.
+    direct_clauses = True
+    # The at-most-one encoding (see wumpus_kb.at_most_one_clauses) of the
+    # wumpus and of the actions, used with direct_clauses.
+    amo_encoding = 'pairwise'
+
+    def __init__(self, heading='east', environment=None, verbose=True, keep_axioms=False):
+        # for debugging: if True, keep easier-to-read PL form in kb.axioms
+        # (built for that purpose alone when direct_clauses is True)
+        self.keep_axioms = keep_axioms
         super(HybridWumpusAgent, self).__init__(self.agent_program, heading, environment, verbose)
 
     def reset(self):
@@ -109,17 +233,27 @@ class HybridWumpusAgent(Explorer):
     def create_wumpus_KB(self):
         if self.verbose:
             print "HWA.create_wumpus_KB(): adding initial wumpus axioms"
-        axioms = initial_wumpus_axioms(self.belief_location[0],self.belief_location[1],
-                                       self.width,self.height,
-                                       self.heading_str(self.belief_heading))
-        if self.verbose:
             start_time = clock()
-            print "    total number of axioms={0}".format(len(axioms))
-        kb = PropKB_SAT()
-        for sentence in axioms:
-            kb.tell(sentence)
-        if self.keep_axioms:
-            kb.axioms = axioms
+        self.symbols = WumpusSymbolTable(1, self.width, 1, self.height)
+        kb = PropKB_SAT(symbols = self.symbols)
+        kb.axioms = []
+        if self.direct_clauses:
+            kb.tell_clauses(initial_wumpus_clauses(self.symbols,
+                                                   self.belief_location[0],self.belief_location[1],
+                                                   self.width,self.height,
+                                                   self.heading_str(self.belief_heading),
+                                                   self.amo_encoding))
+        if not self.direct_clauses or self.keep_axioms:
+            axioms = initial_wumpus_axioms(self.belief_location[0],self.belief_location[1],
+                                           self.width,self.height,
+                                           self.heading_str(self.belief_heading))
+            if self.verbose:
+                print "    total number of axioms={0}".format(len(axioms))
+            if not self.direct_clauses:
+                for sentence in axioms:
+                    kb.tell(sentence)
+            if self.keep_axioms:
+                kb.axioms = axioms
         if self.verbose:
             end_time = clock()
             print "    total number of clauses={0}".format(len(kb.clauses))
@@ -131,8 +265,27 @@ class HybridWumpusAgent(Explorer):
         if self.verbose: print "   HWA.make_percept_sentence(): {0}".format(sentence)
         return sentence
 
+    @traced_phase('add_temporal_axioms')
     def add_temporal_axioms(self):
         if self.verbose: print "       HWA.add_temporal_axioms()"
+        if self.direct_clauses:
+            clauses = temporal_wumpus_clauses(self.symbols, self.time,
+                                              self.belief_location[0],self.belief_location[1],
+                                              self.width,self.height,
+                                              self.heading_str(self.belief_heading),
+                                              self.amo_encoding)
+            if self.verbose: print "       Total number of clauses being added:  {0}".format(len(clauses))
+            self.kb.tell_clauses(clauses)
+        if not self.direct_clauses or self.keep_axioms:
+            axioms = self.temporal_axioms()
+            if not self.direct_clauses:
+                for sentence in axioms:
+                    self.kb.tell(sentence)
+            if self.keep_axioms:
+                self.kb.axioms += axioms
+
+    def temporal_axioms(self):
+        "The axiom strings for the current time."
         axioms = generate_square_OK_axioms(self.time,1,self.width,1,self.height)
         if self.verbose:
             ax_so_far = len(axioms)
@@ -165,16 +318,12 @@ class HybridWumpusAgent(Explorer):
             print "           number of mutually_exclusive axioms:  {0}".format(mutually_exclusive)
         
         if self.verbose: print "       Total number of axioms being added:  {0}".format(len(axioms))
-        
-        for sentence in axioms:
-            self.kb.tell(sentence)
-        if self.keep_axioms:
-            self.kb.axioms += axioms
+        return axioms
 
     def wumpus_alive_query(self):
         if self.verbose:
             print "       Ask if Wumpus is Alive:"
-        query = expr(state_wumpus_alive_str(self.time))
+        query = self.symbols.prop('WumpusAlive', t=self.time)
         result = self.kb.ask(query)
         if self.verbose:
             if result == None:
@@ -182,6 +331,7 @@ class HybridWumpusAgent(Explorer):
             else:
                 print "         Is Wumpus Alive? : {0}".format(result)
 
+    @traced_phase('find_OK_locations')
     def find_OK_locations(self):
         if self.verbose:
             print "     HWA.find_OK_locations()"
@@ -193,7 +343,7 @@ class HybridWumpusAgent(Explorer):
         safe_loc = []
         for x in range(1,self.width+1):
             for y in range(1,self.height+1):
-                query = expr(state_OK_str(x,y,self.time))
+                query = self.symbols.prop('OK', x, y, self.time)
                 result = self.kb.ask(query)
                 if result:
                     safe_loc.append((x,y))
@@ -209,6 +359,7 @@ class HybridWumpusAgent(Explorer):
             print display_env.to_string(self.time, title="Find OK locations queries")
         return safe_loc
 
+    @traced_phase('update_unvisited_locations')
     def update_unvisited_locations(self):
         """ This cheats in the sense of not being fully based on inference,
         but is far more efficient
@@ -229,7 +380,7 @@ class HybridWumpusAgent(Explorer):
                 display_env.add_thing(Proposition(expr('~Vis'),'T'),(x,y))
             start_time = clock()
         for (x,y) in self.unvisited:
-            query = expr(state_loc_str(x,y,self.time))
+            query = self.symbols.prop('L', x, y, self.time)
             vis_query_result = self.kb.ask(query)
             if vis_query_result:
                 self.unvisited.remove((x,y))
@@ -252,6 +403,7 @@ class HybridWumpusAgent(Explorer):
             display_env.add_thing(Proposition(loc_prop,'T'),(x,y))
         print display_env.to_string(self.time, title=title)
 
+    @traced_phase('find_possible_wumpus_locations')
     def find_possible_wumpus_locations(self):
         if self.verbose:
             print "     HWA.find_possible_wumpus_locations()"
@@ -260,7 +412,7 @@ class HybridWumpusAgent(Explorer):
         possible_wumpus_loc = []
         for x in range(1,self.width+1):
             for y in range(1,self.height+1):
-                query = expr(wumpus_str(x,y))
+                query = self.symbols.prop('W', x, y)
                 result = self.kb.ask(query)
                 if result != False:
                     possible_wumpus_loc.append((x,y))
@@ -277,6 +429,7 @@ class HybridWumpusAgent(Explorer):
             print "Possible locations: {0}".format(possible_wumpus_loc)
         return possible_wumpus_loc
 
+    @traced_phase('find_not_unsafe_locations')
     def find_not_unsafe_locations(self):
         if self.verbose:
             print "   HWA.find_not_unsafe_locations()"
@@ -285,7 +438,7 @@ class HybridWumpusAgent(Explorer):
         not_unsafe = []
         for x in range(1,self.width+1):
             for y in range(1,self.height+1):
-                query = expr(state_OK_str(x,y,self.time))
+                query = self.symbols.prop('OK', x, y, self.time)
                 result = self.kb.ask(query)
                 if result != False:
                     not_unsafe.append((x,y))
@@ -303,15 +456,16 @@ class HybridWumpusAgent(Explorer):
             # print "Not Unsafe locations: {0}".format(not_unsafe)
         return not_unsafe
 
+    @traced_phase('infer_and_set_belief_location')
     def infer_and_set_belief_location(self):
         if self.verbose: start_time = clock()
         self.belief_location = None
         for x in range(1,self.width+1):
             for y in range(1,self.height+1):
-                query = expr(state_loc_str(x,y,self.time))
+                query = self.symbols.prop('L', x, y, self.time)
                 result = self.kb.ask(query)
                 if result:
-                    self.belief_location = loc_proposition_to_tuple('{0}'.format(query))
+                    self.belief_location = (x, y)
         if not self.belief_location:
             if self.verbose:
                 print "        --> FAILED TO INFER belief location, assuming at initial location (entrance)."
@@ -323,16 +477,17 @@ class HybridWumpusAgent(Explorer):
                   + " {0}".format(end_time-start_time)
             self.belief_loc_query_times.append(end_time-start_time)
 
+    @traced_phase('infer_and_set_belief_heading')
     def infer_and_set_belief_heading(self):
         self.belief_heading = None
         if self.verbose: start_time = clock()
-        if self.kb.ask(expr(state_heading_north_str(self.time))):
+        if self.kb.ask(self.symbols.prop('HeadingNorth', t=self.time)):
             self.belief_heading = Explorer.heading_str_to_num['north']
-        elif self.kb.ask(expr(state_heading_west_str(self.time))):
+        elif self.kb.ask(self.symbols.prop('HeadingWest', t=self.time)):
             self.belief_heading = Explorer.heading_str_to_num['west']
-        elif self.kb.ask(expr(state_heading_south_str(self.time))):
+        elif self.kb.ask(self.symbols.prop('HeadingSouth', t=self.time)):
             self.belief_heading = Explorer.heading_str_to_num['south']
-        elif self.kb.ask(expr(state_heading_east_str(self.time))):
+        elif self.kb.ask(self.symbols.prop('HeadingEast', t=self.time)):
             self.belief_heading = Explorer.heading_str_to_num['east']
 
         else:
@@ -346,17 +501,25 @@ class HybridWumpusAgent(Explorer):
                   + "{0}".format(end_time-start_time)
             
 
+    @traced_phase('agent_program')
     def agent_program(self, percept):
         " Implementation of Hybrid-Wumpus-Agent of [Fig. 7.20], p.270 "
         if self.verbose: print "HWA.agent_program(): at time {0}".format(self.time)
         
-        percept_sentence = self.make_percept_sentence(percept)
-        if self.verbose:
-            print "     HWA.agent_program(): kb.tell(percept_sentence):"
-            print "         {0}".format(percept_sentence)
-        self.kb.tell(percept_sentence) # update the agent's KB based on percepts
+        # update the agent's KB based on percepts
+        if self.direct_clauses:
+            if self.verbose:
+                print "     HWA.agent_program(): kb.tell_clauses(percepts):"
+                print "         {0}".format(self.pretty_percept_vector(percept))
+            self.kb.tell_clauses(clauses_percept_sentence(self.symbols, self.time, percept))
+        else:
+            percept_sentence = self.make_percept_sentence(percept)
+            if self.verbose:
+                print "     HWA.agent_program(): kb.tell(percept_sentence):"
+                print "         {0}".format(percept_sentence)
+            self.kb.tell(percept_sentence)
         if self.keep_axioms:
-            self.kb.axioms.append(percept_sentence)
+            self.kb.axioms.append(axiom_generator_percept_sentence(self.time, percept))
 
         # update belief location and heading based on current KB knowledge state
         if self.verbose: print "     HWA.infer_and_set_belief_location()"
@@ -378,7 +541,7 @@ class HybridWumpusAgent(Explorer):
         safe = None
 
         # If Glitter, Grab gold and leave
-        if self.kb.ask(percept_glitter_str(self.time)):
+        if self.kb.ask(self.symbols.prop('Glitter', t=self.time)):
             if self.verbose: print "   HWA.agent_program(): Grab gold and leave!"
             safe = self.find_OK_locations()
             if self.verbose: start_time = clock()
@@ -416,7 +579,7 @@ class HybridWumpusAgent(Explorer):
                 print "          >>> time elapsed while executing plan_route():" \
                       + " {0}".format(end_time-start_time)
         # Shoot wumpus to try to clear path
-        if not self.plan and self.kb.ask(expr(state_have_arrow_str(self.time))):
+        if not self.plan and self.kb.ask(self.symbols.prop('HaveArrow', t=self.time)):
             if self.verbose: print "   HWA.agent_program(): Plan to shoot wumpus..."
             possible_wumpus = self.find_possible_wumpus_locations()
             if self.verbose: start_time = clock()
@@ -468,7 +631,10 @@ class HybridWumpusAgent(Explorer):
         if self.verbose: print "   HWA.agent_program(): Action: {0}".format(action)
 
         # update KB with selected action
-        self.kb.tell(add_time_stamp(action, self.time))
+        if self.direct_clauses:
+            self.kb.tell_clauses([(self.symbols.var(action, t=self.time),)])
+        else:
+            self.kb.tell(add_time_stamp(action, self.time))
         if self.keep_axioms:
             self.kb.axioms.append(add_time_stamp(action, self.time))
         
@@ -16,7 +16,11 @@
 # (see http://minisat.se) SAT solver, and is directly based on the satispy
 # python project, see https://github.com/netom/satispy .
 
+import re
+from bisect import bisect_right
+from itertools import combinations, product
 import utils
+from logic import Expr
 
 #-------------------------------------------------------------------------------
 # Wumpus Propositions
@@ -136,6 +140,195 @@ proposition_bases_all = [proposition_bases_atemporal_location,
                          proposition_bases_actions]
 
 
+#-------------------------------------------------------------------------------
+# Symbol table
+#-------------------------------------------------------------------------------
+
+# kind, x, y and time parsed back out of a proposition name
+proposition_name_re = re.compile(r'^([A-Za-z]+?)(\d+)(?:_(\d+))?(?:_(\d+))?$')
+
+class WumpusSymbolTable(object):
+    """
+    Dense integer ids (1, 2, ...) for the wumpus propositions, without
+    formatting or parsing names.  A proposition is a (kind, x, y, t) key,
+    where kind is one of the proposition_bases_*, and x,y (for location
+    kinds) and t (for fluents and actions) are None where they don't apply.
+
+    The atemporal location propositions take the first ids.  The ids of the
+    propositions at time t form a block, allocated the first time one of
+    them is used; within a block (and in the atemporal block) the id is
+    found by arithmetic.  new_aux() allocates ids for auxiliary variables
+    from the same counter, so the ids stay dense.
+
+    The ids are stable, so they can be used directly as DIMACS variable
+    numbers; symbol(v) is the (cached) Expr of the same name as the *_str
+    functions give, and var_of maps an Expr (or name) back to its id.
+    >>> table = WumpusSymbolTable(1, 4, 1, 4)
+    >>> table.var('P', 1, 1), table.var('W', 1, 2), table.var('B', 4, 4)
+    (1, 18, 64)
+    >>> v = table.var('L', 2, 3, 5)
+    >>> v, table.key(v), table.symbol(v)
+    (87, ('L', 2, 3, 5), L2_3_5)
+    >>> table.var('Forward', t=0), table.var_of('Forward0'), table.symbol(table.var('OK', 1, 1, 0))
+    (158, 158, OK1_1_0)
+    >>> a = table.new_aux()
+    >>> a, table.key(a), table.size
+    (165, ('Aux', 165, None, None), 165)
+    >>> table.var_of(Expr('HeadingEast', 5)) is None, table.location(table.var_of('L1_2_0'))
+    (True, (1, 2))
+
+    Locations off the grid and negative times are not in the table, nor
+    are Aux ids until new_aux() allocates them.
+    >>> table.var_of('P5_1'), table.var_of('W1_7'), table.var_of('L0_0_0'), table.var_of('P0_0')
+    (None, None, None, None)
+    >>> table.var('Forward', t=-1)
+    Traceback (most recent call last):
+    ValueError: No proposition Forward-1 in the table
+    >>> table.var_of('Aux166'), table.new_aux(), table.var_of('Aux166')
+    (None, 166, 166)
+    """
+
+    atemporal_kinds = proposition_bases_atemporal_location
+    location_kinds = proposition_bases_location_fluents
+    temporal_kinds = (proposition_bases_perceptual_fluents
+                      + proposition_bases_state_fluents
+                      + proposition_bases_actions)
+
+    def __init__(self, xmin, xmax, ymin, ymax):
+        self.xmin, self.xmax, self.ymin, self.ymax = xmin, xmax, ymin, ymax
+        self.height = ymax - ymin + 1
+        self.cells = (xmax - xmin + 1) * self.height
+        self.offset = {}    # kind -> offset of its first id within a block
+        for i, kind in enumerate(self.atemporal_kinds):
+            self.offset[kind] = i * self.cells
+        for i, kind in enumerate(self.location_kinds):
+            self.offset[kind] = i * self.cells
+        for i, kind in enumerate(self.temporal_kinds):
+            self.offset[kind] = len(self.location_kinds) * self.cells + i
+        self.block_size = len(self.location_kinds) * self.cells + len(self.temporal_kinds)
+        self.time_start = {}          # t -> first id of the block for time t
+        self.starts = [1]             # first id of each block, in order
+        self.block_times = [None]     # the t of each block ('aux' for aux ids)
+        self.size = len(self.atemporal_kinds) * self.cells  # the highest id
+        self.symbols = [None] * (self.size + 1)  # id -> Expr, when built
+        self.ids = {}                 # Expr or name -> id, when looked up
+
+    def cell(self, x, y):
+        return (x - self.xmin) * self.height + (y - self.ymin)
+
+    def block(self, t):
+        "The first id of the block for time t, allocating it if need be."
+        start = self.time_start.get(t)
+        if start is None:
+            start = self.time_start[t] = self.size + 1
+            self.starts.append(start)
+            self.block_times.append(t)
+            self.size += self.block_size
+            self.symbols.extend([None] * self.block_size)
+        return start
+
+    def var(self, kind, x = None, y = None, t = None):
+        """The id of the proposition (kind, x, y, t); ValueError if x,y is
+        off the grid or t is negative."""
+        if ((x is not None and not (self.xmin <= x <= self.xmax
+                                    and self.ymin <= y <= self.ymax))
+            or (t is not None and t < 0)):
+            raise ValueError('No proposition {0}{1} in the table'.format(
+                kind, '_'.join(str(i) for i in (x, y, t) if i is not None)))
+        if t is None:
+            return 1 + self.offset[kind] + self.cell(x, y)
+        if x is None:
+            return self.block(t) + self.offset[kind]
+        return self.block(t) + self.offset[kind] + self.cell(x, y)
+
+    def new_aux(self):
+        "A fresh id for an auxiliary variable, named Aux<id>."
+        self.size += 1
+        if self.block_times[-1] != 'aux':
+            self.starts.append(self.size)
+            self.block_times.append('aux')
+        self.symbols.append(None)
+        return self.size
+
+    def key(self, v):
+        "The (kind, x, y, t) of id v."
+        b = bisect_right(self.starts, v) - 1
+        t, i = self.block_times[b], v - self.starts[b]
+        if t == 'aux':
+            return ('Aux', v, None, None)
+        if t is None:
+            kinds = self.atemporal_kinds
+        elif i >= len(self.location_kinds) * self.cells:
+            return (self.temporal_kinds[i - len(self.location_kinds) * self.cells],
+                    None, None, t)
+        else:
+            kinds = self.location_kinds
+        kind, c = divmod(i, self.cells)
+        x, y = divmod(c, self.height)
+        return (kinds[kind], x + self.xmin, y + self.ymin, t)
+
+    def location(self, v):
+        "The (x, y) of id v (as loc_proposition_to_tuple does for its name)."
+        return self.key(v)[1:3]
+
+    def name(self, v):
+        kind, x, y, t = self.key(v)
+        if kind == 'Aux':
+            return 'Aux{0}'.format(v)
+        if x is None:
+            return '{0}{1}'.format(kind, t)
+        if t is None:
+            return '{0}{1}_{2}'.format(kind, x, y)
+        return '{0}{1}_{2}_{3}'.format(kind, x, y, t)
+
+    def symbol(self, v):
+        "The Expr for id v."
+        e = self.symbols[v]
+        if e is None:
+            e = self.symbols[v] = Expr(self.name(v))
+            self.ids[e] = v
+        return e
+
+    def prop(self, kind, x = None, y = None, t = None):
+        "The Expr for proposition (kind, x, y, t)."
+        return self.symbol(self.var(kind, x, y, t))
+
+    def var_of(self, symbol):
+        """The id of a proposition symbol (an Expr or its name), or None if
+        it is not a wumpus proposition of the table.  Names are parsed once
+        only; names that are not (yet) in the table are parsed every time,
+        since an Aux name may be allocated later."""
+        v = self.ids.get(symbol)
+        if v is None:
+            v = self.parse(str(symbol))
+            if v is not None:
+                self.ids[symbol] = v
+        return v
+
+    def parse(self, name):
+        "The id of the proposition named name, or None."
+        try:
+            return self.parse_var(name)
+        except ValueError: # off the grid, or a negative time
+            return None
+
+    def parse_var(self, name):
+        m = proposition_name_re.match(name)
+        if m:
+            kind, a, b, c = m.groups()
+            if name.startswith('Aux'):
+                v = int(name[3:])
+                if v <= self.size and self.key(v)[0] == 'Aux':
+                    return v
+            elif kind in self.atemporal_kinds and b is not None and c is None:
+                return self.var(kind, int(a), int(b))
+            elif kind in self.location_kinds and c is not None:
+                return self.var(kind, int(a), int(b), int(c))
+            elif kind in self.temporal_kinds and b is None:
+                return self.var(kind, t = int(a))
+        return None
+
+
 #-------------------------------------------------------------------------------
 # Axiom Generator: Current Percept Sentence
 #-------------------------------------------------------------------------------
@@ -845,6 +1038,322 @@ def generate_mutually_exclusive_axioms(t):
 
     return filter(lambda s: s != '', axioms)
 
+#-------------------------------------------------------------------------------
+# Clause Generators
+#-------------------------------------------------------------------------------
+
+# The axioms above, emitted directly as CNF clauses: tuples of the ids of a
+# WumpusSymbolTable, negated for negative literals.  These skip formatting
+# the sentence, parsing it with expr and converting it with to_cnf; each
+# clauses_<name> gives (up to subsumed clauses) the CNF of the
+# corresponding axiom_generator_<name>.  Feed them to PropKB_SAT.tell_clauses.
+
+def iff_or(a, literals):
+    " Clauses for a <=> (l1 | l2 | ...) "
+    return [(-a,) + tuple(literals)] + [(a, -l) for l in literals]
+
+def iff_and(a, literals):
+    " Clauses for a <=> (l1 & l2 & ...) "
+    return [(a,) + tuple(-l for l in literals)] + [(-a, l) for l in literals]
+
+def iff_dnf(a, terms):
+    """ Clauses for a <=> (t1 | t2 | ...), each term a conjunction
+    (a tuple) of literals.  The a => ... direction is distributed over the
+    terms, so tautologies and subsumed clauses are removed.
+    >>> sorted(iff_dnf(1, [(2, 3), (2, -4)]))
+    [(-1, 2), (-1, 3, -4), (1, -2, -3), (1, -2, 4)]
+    """
+    clauses = [(a,) + tuple(-l for l in term) for term in terms]
+    return clauses + simplify_clauses([(-a,) + choice
+                                       for choice in product(*terms)])
+
+def simplify_clauses(clauses):
+    """ The clauses, with repeated literals, tautologies and subsumed
+    clauses removed (the shortest first, literals sorted by variable).
+    >>> simplify_clauses([(1, 2, 1), (2, -2), (1, 2, 3), (2, 1)])
+    [(1, 2)]
+    """
+    result = []
+    for clause in sorted(set(tuple(sorted(set(c), key=abs)) for c in clauses), key=len):
+        lits = frozenset(clause)
+        if any(-l in lits for l in lits):
+            continue
+        if not any(kept <= lits for kept, _ in result):
+            result.append((lits, clause))
+    return [clause for _, clause in result]
+
+def clauses_percept_sentence(table, t, tvec):
+    return [(table.var(kind, t=t) if value else -table.var(kind, t=t),)
+            for kind, value in zip(proposition_bases_perceptual_fluents, tvec)]
+
+def clauses_initial_location_assertions(table, x, y):
+    return [(-table.var('P', x, y),), (-table.var('W', x, y),)]
+
+def clauses_pits_and_breezes(table, x, y, xmin, xmax, ymin, ymax):
+    adjacent = allowed_adjacent_locations(x, y, xmin, xmax, ymin, ymax)
+    return iff_or(table.var('B', x, y),
+                  [table.var('P', xi, yi) for xi, yi in adjacent + [(x, y)]])
+
+def clauses_wumpus_and_stench(table, x, y, xmin, xmax, ymin, ymax):
+    adjacent = allowed_adjacent_locations(x, y, xmin, xmax, ymin, ymax)
+    return iff_or(table.var('S', x, y),
+                  [table.var('W', xi, yi) for xi, yi in adjacent + [(x, y)]])
+
+def clauses_at_least_one_wumpus(table, xmin, xmax, ymin, ymax):
+    return [tuple(table.var('W', x, y)
+                  for x, y in all_possible_squares(xmin, xmax, ymin, ymax))]
+
+def clauses_at_most_one_wumpus(table, xmin, xmax, ymin, ymax, encoding = 'pairwise'):
+    wumpi = [table.var('W', x, y) for x, y in all_possible_squares(xmin, xmax, ymin, ymax)]
+    return at_most_one_clauses(table, wumpi, encoding)
+
+def clauses_only_in_one_location(table, xi, yi, xmin, xmax, ymin, ymax, t = 0):
+    return [(table.var('L', x, y, t) if (x, y) == (xi, yi) else -table.var('L', x, y, t),)
+            for x, y in all_possible_squares(xmin, xmax, ymin, ymax)]
+
+heading_kinds = {'north': 'HeadingNorth', 'east': 'HeadingEast',
+                 'south': 'HeadingSouth', 'west': 'HeadingWest'}
+
+def clauses_only_one_heading(table, heading = 'north', t = 0):
+    return [(table.var(kind, t=t) if kind == heading_kinds[heading] else -table.var(kind, t=t),)
+            for kind in ['HeadingNorth', 'HeadingEast', 'HeadingSouth', 'HeadingWest']]
+
+def clauses_have_arrow_and_wumpus_alive(table, t = 0):
+    return [(table.var('HaveArrow', t=t),), (table.var('WumpusAlive', t=t),)]
+
+def initial_wumpus_clauses(table, xi, yi, width, height, heading='east',
+                           amo_encoding = 'pairwise'):
+    """
+    The clauses of initial_wumpus_axioms; amo_encoding is the at-most-one
+    encoding used for the wumpus (see at_most_one_clauses).
+    """
+    clauses = clauses_initial_location_assertions(table, xi, yi)
+    for x, y in all_possible_squares(1, width, 1, height):
+        clauses += clauses_pits_and_breezes(table, x, y, 1, width, 1, height)
+    for x, y in all_possible_squares(1, width, 1, height):
+        clauses += clauses_wumpus_and_stench(table, x, y, 1, width, 1, height)
+    clauses += clauses_at_least_one_wumpus(table, 1, width, 1, height)
+    clauses += clauses_at_most_one_wumpus(table, 1, width, 1, height, amo_encoding)
+    clauses += clauses_only_in_one_location(table, xi, yi, 1, width, 1, height)
+    clauses += clauses_only_one_heading(table, heading)
+    clauses += clauses_have_arrow_and_wumpus_alive(table)
+    return clauses
+
+def clauses_location_OK(table, x, y, t):
+    ok, pit = table.var('OK', x, y, t), table.var('P', x, y)
+    alive, wumpus = table.var('WumpusAlive', t=t), table.var('W', x, y)
+    return [(-ok, -pit), (-ok, -alive, -wumpus), (ok, pit, alive), (ok, pit, wumpus)]
+
+def clauses_breeze_percept_and_location_property(table, x, y, t):
+    loc, percept, breeze = table.var('L', x, y, t), table.var('Breeze', t=t), table.var('B', x, y)
+    return [(-loc, -percept, breeze), (-loc, percept, -breeze)]
+
+def clauses_stench_percept_and_location_property(table, x, y, t):
+    loc, percept, stench = table.var('L', x, y, t), table.var('Stench', t=t), table.var('S', x, y)
+    return [(-loc, -percept, stench), (-loc, percept, -stench)]
+
+def clauses_at_location_ssa(table, t, x, y, xmin, xmax, ymin, ymax):
+    forward = table.var('Forward', t=t)
+    here = table.var('L', x, y, t)
+    # moving in from a neighbour facing this way, or staying put: not
+    # moving forward, or bumping into a wall
+    terms = [(table.var('L', xn, yn, t), table.var(heading, t=t), forward)
+             for xn, yn, heading in [(x, y+1, 'HeadingSouth'), (x, y-1, 'HeadingNorth'),
+                                     (x+1, y, 'HeadingWest'), (x-1, y, 'HeadingEast')]
+             if (xn, yn) in allowed_adjacent_locations(x, y, xmin, xmax, ymin, ymax)]
+    terms += [(here, -forward), (here, table.var('Bump', t=t+1))]
+    return iff_dnf(table.var('L', x, y, t+1), terms)
+
+def generate_at_location_ssa_clauses(table, t, x, y, xmin, xmax, ymin, ymax, heading):
+    """
+    The clauses of generate_at_location_ssa: the at_location SSA for the
+    current location and the one ahead.
+    """
+    x1, y1 = {'west': (x-1, y), 'east': (x+1, y),
+              'south': (x, y-1), 'north': (x, y+1)}[heading]
+    clauses = clauses_at_location_ssa(table, t, x, y, xmin, xmax, ymin, ymax)
+    if xmin <= x1 <= xmax and ymin <= y1 <= ymax:
+        clauses += clauses_at_location_ssa(table, t, x1, y1, xmin, xmax, ymin, ymax)
+    return clauses
+
+def clauses_have_arrow_ssa(table, t):
+    return iff_and(table.var('HaveArrow', t=t+1),
+                   [table.var('HaveArrow', t=t), -table.var('Shoot', t=t)])
+
+def clauses_wumpus_alive_ssa(table, t):
+    return iff_and(table.var('WumpusAlive', t=t+1),
+                   [table.var('WumpusAlive', t=t), -table.var('Scream', t=t+1)])
+
+# heading -> (heading after TurnRight, heading after TurnLeft)
+heading_turns = {'HeadingNorth': ('HeadingEast', 'HeadingWest'),
+                 'HeadingEast': ('HeadingSouth', 'HeadingNorth'),
+                 'HeadingSouth': ('HeadingWest', 'HeadingEast'),
+                 'HeadingWest': ('HeadingNorth', 'HeadingSouth')}
+
+def clauses_heading_ssa(table, heading, t):
+    """ The clauses of axiom_generator_heading_<heading>_ssa, where
+    heading is a kind such as 'HeadingNorth'. """
+    right, left = table.var('TurnRight', t=t), table.var('TurnLeft', t=t)
+    terms = [(table.var(h, t=t), right) for h in heading_turns
+             if heading_turns[h][0] == heading]
+    terms += [(table.var(h, t=t), left) for h in heading_turns
+              if heading_turns[h][1] == heading]
+    terms.append((table.var(heading, t=t), -right, -left))
+    return iff_dnf(table.var(heading, t=t+1), terms)
+
+def generate_non_location_ssa_clauses(table, t):
+    clauses = clauses_have_arrow_ssa(table, t) + clauses_wumpus_alive_ssa(table, t)
+    for heading in ['HeadingNorth', 'HeadingEast', 'HeadingSouth', 'HeadingWest']:
+        clauses += clauses_heading_ssa(table, heading, t)
+    return clauses
+
+def clauses_heading_only(table, heading, t):
+    """ The clauses of axiom_generator_heading_only_<heading>. """
+    return iff_and(table.var(heading, t=t),
+                   [-table.var(h, t=t) for h in
+                    ['HeadingNorth', 'HeadingEast', 'HeadingSouth', 'HeadingWest']
+                    if h != heading])
+
+def clauses_only_one_action_axioms(table, t, encoding = 'pairwise'):
+    actions = [table.var(action, t=t) for action in proposition_bases_actions]
+    return at_most_one_clauses(table, actions, encoding)
+
+def generate_mutually_exclusive_clauses(table, t, amo_encoding = 'pairwise'):
+    clauses = []
+    for heading in ['HeadingNorth', 'HeadingEast', 'HeadingSouth', 'HeadingWest']:
+        clauses += clauses_heading_only(table, heading, t + 1)
+    return clauses + clauses_only_one_action_axioms(table, t, amo_encoding)
+
+def temporal_wumpus_clauses(table, t, x, y, width, height, heading,
+                            amo_encoding = 'pairwise'):
+    """
+    The clauses of the axioms HybridWumpusAgent.add_temporal_axioms adds
+    at time t, with the agent believed to be at x,y facing heading;
+    amo_encoding is used for the only-one-action constraint.
+    """
+    clauses = []
+    squares = all_possible_squares(1, width, 1, height)
+    for xi, yi in squares:
+        clauses += clauses_location_OK(table, xi, yi, t)
+    for xi, yi in squares:
+        clauses += clauses_breeze_percept_and_location_property(table, xi, yi, t)
+    for xi, yi in squares:
+        clauses += clauses_stench_percept_and_location_property(table, xi, yi, t)
+    clauses += generate_at_location_ssa_clauses(table, t, x, y, 1, width, 1, height, heading)
+    clauses += generate_non_location_ssa_clauses(table, t)
+    clauses += generate_mutually_exclusive_clauses(table, t, amo_encoding)
+    return clauses
+
+#-------------------------------------------------------------------------------
+# At-most-one encodings
+
+# The pairwise encoding of "at most one of n literals" takes n(n-1)/2
+# clauses: 32640 for the wumpus on a 16x16 grid.  The others add auxiliary
+# variables (allocated from the symbol table, so the KB and the solver
+# number them like any other symbol) to get O(n) or O(n log n) clauses.
+# Each is equisatisfiable with pairwise: an assignment of the literals
+# extends to the auxiliary variables just when at most one is true.
+
+def amo_pairwise(table, literals):
+    " n(n-1)/2 binary clauses, no auxiliary variables. "
+    return [(-a, -b) for a, b in combinations(literals, 2)]
+
+def amo_sequential(table, literals):
+    """ Sinz's sequential counter: s_i is true if one of the first i
+    literals is; 3n-4 clauses and n-1 auxiliary variables. """
+    n = len(literals)
+    if n <= 1:
+        return []
+    s = [table.new_aux() for _ in range(n - 1)]
+    clauses = [(-literals[0], s[0])]
+    for i in range(1, n - 1):
+        clauses += [(-literals[i], s[i]), (-s[i-1], s[i]), (-literals[i], -s[i-1])]
+    clauses.append((-literals[-1], -s[-1]))
+    return clauses
+
+def amo_commander(table, literals, group_size = 3):
+    """ Klieber and Kwon's commander encoding: pairwise within groups of
+    group_size, each group implying its commander variable, and (recursively)
+    at most one commander; about 3n clauses and n/2 auxiliary variables. """
+    if len(literals) <= group_size + 1:
+        return amo_pairwise(table, literals)
+    clauses, commanders = [], []
+    for i in range(0, len(literals), group_size):
+        group = literals[i:i + group_size]
+        c = table.new_aux()
+        commanders.append(c)
+        clauses += amo_pairwise(table, group)
+        clauses += [(-x, c) for x in group]
+    return clauses + amo_commander(table, commanders, group_size)
+
+def amo_bimander(table, literals, group_size = 2):
+    """ Nguyen and Mai's bimander encoding: pairwise within groups of
+    group_size, and each group's number given in binary by log2(n/group_size)
+    auxiliary variables that every literal of the group implies. """
+    groups = [literals[i:i + group_size] for i in range(0, len(literals), group_size)]
+    clauses = []
+    for group in groups:
+        clauses += amo_pairwise(table, group)
+    bits = [table.new_aux() for _ in range(max(len(groups) - 1, 0).bit_length())]
+    for i, group in enumerate(groups):
+        for x in group:
+            clauses += [(-x, b if (i >> k) & 1 else -b) for k, b in enumerate(bits)]
+    return clauses
+
+amo_encodings = {'pairwise': amo_pairwise,
+                 'sequential': amo_sequential,
+                 'commander': amo_commander,
+                 'bimander': amo_bimander}
+
+def at_most_one_clauses(table, literals, encoding = 'pairwise'):
+    """
+    Clauses saying that at most one of the literals (symbol table ids) is
+    true, in the encoding named (one of amo_encodings).
+    >>> table = WumpusSymbolTable(1, 4, 1, 4)
+    >>> wumpi = [table.var('W', x, y) for x, y in all_possible_squares(1, 4, 1, 4)]
+    >>> [len(at_most_one_clauses(table, wumpi, e)) for e in
+    ...  ['pairwise', 'sequential', 'commander', 'bimander']]
+    [120, 44, 44, 56]
+    """
+    if encoding not in amo_encodings:
+        raise ValueError("Unknown at-most-one encoding '{0}' (choose from {1})"
+                         .format(encoding, ', '.join(sorted(amo_encodings))))
+    return amo_encodings[encoding](table, list(literals))
+
+def compare_at_most_one_encodings(sizes = (4, 8, 16)):
+    """
+    For n x n grids, the size of the initial wumpus KB with each at-most-one
+    encoding of the wumpus, and the time logic.DPLLSolver takes to decide
+    for every square whether there may be a Wumpus there (two solves per
+    square, as HybridWumpusAgent.find_possible_wumpus_locations asks),
+    given a stench at 1,2 and none at 1,1.
+    """
+    from logic import DPLLSolver
+    from timeit import default_timer as timer
+    rows = []
+    for n in sizes:
+        for encoding in ['pairwise', 'sequential', 'commander', 'bimander']:
+            table = WumpusSymbolTable(1, n, 1, n)
+            clauses = initial_wumpus_clauses(table, 1, 1, n, n, 'east', encoding)
+            clauses += [(table.var('S', 1, 2),), (-table.var('S', 1, 1),)]
+            aux = len([v for v in range(1, table.size + 1) if table.key(v)[0] == 'Aux'])
+            start = timer()
+            solver = DPLLSolver()
+            for v in range(1, table.size + 1):
+                solver.var(table.symbol(v))  # so that var numbers are the ids
+            for clause in clauses:
+                solver.add_int_clause(list(clause))
+            possible = 0
+            for x, y in all_possible_squares(1, n, 1, n):
+                w = table.prop('W', x, y)
+                if solver.solve([w]):
+                    possible += 1
+                    solver.solve([~w])
+            rows.append(['{0}x{0}'.format(n), encoding, len(clauses), aux,
+                         possible, timer() - start])
+    utils.print_table(rows, header = ['Grid', 'Encoding', 'Clauses', 'Aux',
+                                      'Possible', 'Time(s)'], numfmt = '%.5g')
+
 #-------------------------------------------------------------------------------
 
 # Some utility functions go here:
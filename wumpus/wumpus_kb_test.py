@@ -1,4 +1,5 @@
 from wumpus_kb import *
+from logic import expr, to_cnf, conjuncts, clause_to_ints, DPLLSolver
 
 
 def test_axiom_generation():
@@ -83,4 +84,131 @@ def test_axiom_generation():
     print only_one_action
 
 
+def string_path_clauses(table, axioms):
+    """ The clauses the KB gets from the axiom strings (parsed by expr and
+    converted by to_cnf), as clauses of symbol-table ids. """
+    clauses = []
+    for axiom in axioms:
+        for clause in conjuncts(to_cnf(expr(axiom))):
+            ints = clause_to_ints(clause, table.var_of)
+            if ints is not None:
+                clauses.append(tuple(ints))
+    return clauses
+
+def test_clause_generation():
+    """ Check that each clause generator gives the same clauses (up to
+    subsumed clauses) as its axiom generator. """
+    table = WumpusSymbolTable(1, 4, 1, 4)
+    heading_axioms = {'HeadingNorth': (axiom_generator_heading_north_ssa,
+                                       axiom_generator_heading_only_north),
+                      'HeadingEast': (axiom_generator_heading_east_ssa,
+                                      axiom_generator_heading_only_east),
+                      'HeadingSouth': (axiom_generator_heading_south_ssa,
+                                       axiom_generator_heading_only_south),
+                      'HeadingWest': (axiom_generator_heading_west_ssa,
+                                      axiom_generator_heading_only_west)}
+    pairs = [('percept_sentence',
+              [axiom_generator_percept_sentence(3, (True, False, True, False, True))],
+              clauses_percept_sentence(table, 3, (True, False, True, False, True))),
+             ('initial_location_assertions',
+              [axiom_generator_initial_location_assertions(1, 1)],
+              clauses_initial_location_assertions(table, 1, 1)),
+             ('pits_and_breezes',
+              [axiom_generator_pits_and_breezes(2, 1, 1, 4, 1, 4)],
+              clauses_pits_and_breezes(table, 2, 1, 1, 4, 1, 4)),
+             ('wumpus_and_stench',
+              [axiom_generator_wumpus_and_stench(2, 3, 1, 4, 1, 4)],
+              clauses_wumpus_and_stench(table, 2, 3, 1, 4, 1, 4)),
+             ('at_least_one_wumpus',
+              [axiom_generator_at_least_one_wumpus(1, 4, 1, 4)],
+              clauses_at_least_one_wumpus(table, 1, 4, 1, 4)),
+             ('at_most_one_wumpus',
+              [axiom_generator_at_most_one_wumpus(1, 4, 1, 4)],
+              clauses_at_most_one_wumpus(table, 1, 4, 1, 4)),
+             ('only_in_one_location',
+              [axiom_generator_only_in_one_location(2, 3, 1, 4, 1, 4, t=5)],
+              clauses_only_in_one_location(table, 2, 3, 1, 4, 1, 4, t=5)),
+             ('only_one_heading',
+              [axiom_generator_only_one_heading('east', t=8)],
+              clauses_only_one_heading(table, 'east', t=8)),
+             ('have_arrow_and_wumpus_alive',
+              [axiom_generator_have_arrow_and_wumpus_alive(t=8)],
+              clauses_have_arrow_and_wumpus_alive(table, t=8)),
+             ('location_OK',
+              [axiom_generator_location_OK(2, 3, 8)],
+              clauses_location_OK(table, 2, 3, 8)),
+             ('breeze_percept_and_location_property',
+              [axiom_generator_breeze_percept_and_location_property(2, 3, 8)],
+              clauses_breeze_percept_and_location_property(table, 2, 3, 8)),
+             ('stench_percept_and_location_property',
+              [axiom_generator_stench_percept_and_location_property(2, 3, 8)],
+              clauses_stench_percept_and_location_property(table, 2, 3, 8)),
+             ('at_location_ssa (inner square)',
+              [axiom_generator_at_location_ssa(8, 2, 3, 1, 4, 1, 4)],
+              clauses_at_location_ssa(table, 8, 2, 3, 1, 4, 1, 4)),
+             ('at_location_ssa (corner)',
+              [axiom_generator_at_location_ssa(8, 1, 1, 1, 4, 1, 4)],
+              clauses_at_location_ssa(table, 8, 1, 1, 1, 4, 1, 4)),
+             ('have_arrow_ssa',
+              [axiom_generator_have_arrow_ssa(8)],
+              clauses_have_arrow_ssa(table, 8)),
+             ('wumpus_alive_ssa',
+              [axiom_generator_wumpus_alive_ssa(8)],
+              clauses_wumpus_alive_ssa(table, 8))]
+    for heading, (ssa, only) in sorted(heading_axioms.items()):
+        pairs.append(('heading_ssa ' + heading, [ssa(8)],
+                      clauses_heading_ssa(table, heading, 8)))
+        pairs.append(('heading_only ' + heading, [only(8)],
+                      clauses_heading_only(table, heading, 8)))
+    pairs += [('only_one_action_axioms',
+               [axiom_generator_only_one_action_axioms(8)],
+               clauses_only_one_action_axioms(table, 8)),
+              ('initial_wumpus_axioms',
+               initial_wumpus_axioms(1, 1, 4, 4, 'east'),
+               initial_wumpus_clauses(table, 1, 1, 4, 4, 'east')),
+              ('add_temporal_axioms at time 4',
+               generate_square_OK_axioms(4, 1, 4, 1, 4)
+               + generate_breeze_percept_and_location_axioms(4, 1, 4, 1, 4)
+               + generate_stench_percept_and_location_axioms(4, 1, 4, 1, 4)
+               + generate_at_location_ssa(4, 2, 2, 1, 4, 1, 4, 'north')
+               + generate_non_location_ssa(4)
+               + generate_mutually_exclusive_axioms(4),
+               temporal_wumpus_clauses(table, 4, 2, 2, 4, 4, 'north'))]
+
+    print '\nclause generators vs. axiom generators:'
+    failures = 0
+    for name, axioms, clauses in pairs:
+        expected = simplify_clauses(string_path_clauses(table, axioms))
+        got = simplify_clauses(clauses)
+        same = (set(expected) == set(got))
+        failures += not same
+        print '    {0:40} {1:5} clauses  {2}'.format(name, len(got), 'ok' if same else 'DIFFERENT')
+    print 'failures:', failures
+
+def test_at_most_one_encodings():
+    """ Check that each at-most-one encoding allows exactly the assignments
+    of its literals that have at most one literal true. """
+    from itertools import product
+    print '\nat-most-one encodings (assignments checked, wrong answers):'
+    for encoding in sorted(amo_encodings):
+        checked = wrong = 0
+        for n in range(1, 9):
+            table = WumpusSymbolTable(1, n, 1, 1)
+            literals = [table.var('W', x, 1) for x in range(1, n + 1)]
+            clauses = at_most_one_clauses(table, literals, encoding)
+            solver = DPLLSolver()
+            for v in range(1, table.size + 1):
+                solver.var(table.symbol(v))
+            for clause in clauses:
+                solver.add_int_clause(list(clause))
+            for values in product([True, False], repeat = n):
+                assumptions = [table.symbol(v) if value else ~table.symbol(v)
+                               for v, value in zip(literals, values)]
+                checked += 1
+                wrong += (solver.solve(assumptions) != (sum(values) <= 1))
+        print '    {0:12} {1:5} {2}'.format(encoding, checked, wrong)
+
+
 test_axiom_generation()
+test_clause_generation()
+test_at_most_one_encodings()
@@ -19,6 +19,8 @@
 from wumpus_environment import *
 from wumpus_kb import *
 import search
+import logic
+import random, time
 
 #-------------------------------------------------------------------------------
 # Distance fn
@@ -198,6 +200,200 @@ def test_PRP(initial):
                        (3,0),(3,1),(3,2),(3,3)])
 
 
+#-------------------------------------------------------------------------------
+# Plan Route by SATPlan
+#-------------------------------------------------------------------------------
+
+# heading_str_fns[h] gives the state_heading_*_str fn for heading number h
+heading_str_fns = [state_heading_north_str, state_heading_west_str,
+                   state_heading_south_str, state_heading_east_str]
+
+def plan_route_sat(current, heading, goals, allowed, t_max = None):
+    """
+    Same as plan_route, but the route is found by SATPlan (logic.SATPlanner)
+    over the wumpus_kb propositions: L<x>_<y>_<t>, Heading<H><t> and the
+    actions Forward<t>, TurnLeft<t>, TurnRight<t>.  Routes are shortest
+    (in number of actions), but ties may be broken differently than by
+    plan_route.  t_max defaults to 3 moves per location.
+    >>> plan_route_sat((0,0), 'north', [(0,2)], [(0,0),(0,1),(0,2)])
+    ['Forward', 'Forward']
+    >>> len(plan_route_sat((0,0), 3, [(2,3),(3,2)], [(0,0),(0,1),(1,0),(1,1)]))
+    0
+    """
+    if isinstance(heading,str):
+        heading = Explorer.heading_str_to_num[heading]
+    if not goals or not allowed:
+        return []
+    problem = route_sat_problem((current[0], current[1], heading), goals, allowed)
+    if t_max is None:
+        t_max = 3 * len(allowed)
+    plan = logic.SATPlanner(*problem).plan(t_max)
+    return plan or []
+
+def route_sat_problem(initial, goals, allowed):
+    """
+    The route planning problem as the (init_clauses, layer, goal, actions)
+    functions of time that logic.SATPlanner takes.  initial is (x,y,heading).
+    Each step does exactly one of Forward, TurnLeft and TurnRight; Forward
+    is only allowed into an allowed location (so the plan never bumps).
+    At most one location and one heading hold at each time, and they
+    follow from the ones before by the (planning-only) axioms below.
+    The implied clauses saying that a location is only entered from itself
+    or a neighbour let unit propagation rule out, at each time, the
+    locations too far from the goal, which prunes the DPLL search.
+    """
+    x0, y0, h0 = initial
+    locations = list(allowed)
+    if (x0, y0) not in locations:
+        locations.append((x0, y0))
+    L = lambda x, y, t: logic.expr(state_loc_str(x, y, t))
+    H = lambda h, t: logic.expr(heading_str_fns[h](t))
+    names = ['Forward', 'TurnLeft', 'TurnRight']
+    act_fns = [action_forward_str, action_turn_left_str, action_turn_right_str]
+
+    init_clauses = [L(x, y, 0) if (x, y) == (x0, y0) else ~L(x, y, 0)
+                    for (x, y) in locations]
+    init_clauses += [H(h, 0) if h == h0 else ~H(h, 0) for h in range(4)]
+
+    def layer(t):
+        forward, left, right = [logic.expr(fn(t)) for fn in act_fns]
+        clauses = [forward | left | right, ~forward | ~left,
+                   ~forward | ~right, ~left | ~right]
+        for (x, y) in locations:
+            here = L(x, y, t)
+            clauses.append(~here | forward | L(x, y, t + 1))
+            clauses.append(logic.associate('|', [~L(x, y, t + 1), here] +
+                                           [L(nx, ny, t) for (nx, ny) in locations
+                                            if abs(nx - x) + abs(ny - y) == 1]))
+            for h in range(4):
+                ahead = forward_location(x, y, h)
+                if ahead in locations:
+                    clauses.append(~here | ~H(h, t) | ~forward | L(ahead[0], ahead[1], t + 1))
+                else:
+                    clauses.append(~here | ~H(h, t) | ~forward)
+        for h in range(4):
+            clauses.append(~H(h, t) | ~left | H((h + 1) % 4, t + 1))
+            clauses.append(~H(h, t) | ~right | H((h - 1) % 4, t + 1))
+            clauses.append(~H(h, t) | ~forward | H(h, t + 1))
+        clauses.extend(logic.at_most_one([L(x, y, t + 1) for (x, y) in locations]))
+        clauses.extend(logic.at_most_one([H(h, t + 1) for h in range(4)]))
+        return clauses
+
+    goal = lambda t: [L(x, y, t) for (x, y) in goals if (x, y) in locations]
+    actions = lambda t: [(logic.expr(fn(t)), name) for fn, name in zip(act_fns, names)]
+    return init_clauses, layer, goal, actions
+
+def test_PRP_sat(initial):
+    """
+    test_PRP, with the route planned by plan_route_sat.  The routes have
+    the same lengths as those of test_PRP.
+    >>> [len(test_PRP_sat((0,0,h))) for h in range(4)]
+    [6, 7, 7, 6]
+    """
+    return plan_route_sat((initial[0],initial[1]), initial[2],
+                          [(2,3),(3,2)],
+                          [(0,0),(0,1),(0,2),(0,3),
+                           (1,0),(1,1),(1,2),(1,3),
+                           (2,0),            (2,3),
+                           (3,0),(3,1),(3,2),(3,3)])
+
+#-------------------------------------------------------------------------------
+# Comparing the memory-bounded searchers
+#-------------------------------------------------------------------------------
+
+def random_allowed(width, height, pit_fraction=0.2, seed=0):
+    """ The locations of a width x height grid, less a random pit_fraction
+    of them; the corners (0,0) and (width-1,height-1) are always allowed.
+    >>> len(random_allowed(4, 4, 0.0)), sorted(random_allowed(2, 2, 1.0))
+    (16, [(0, 0), (1, 1)])
+    """
+    r = random.Random(seed)
+    corners = [(0, 0), (width - 1, height - 1)]
+    return set((x, y) for x in range(width) for y in range(height)
+               if (x, y) in corners or r.random() >= pit_fraction)
+
+def compare_memory_bounded_searchers(table_size=100000):
+    """ Print a table of search.InstrumentedProblem statistics and times
+    for the recursive and iterative RBFS, and for IDA*, with and without
+    a transposition table, on NQueensProblem and on route problems: the
+    4x4 test_PRP grid, a random 16x16 grid with pits, and a 1500 location
+    corridor, whose solution is deeper than Python's recursion limit. """
+    corridor = set((x, 0) for x in range(1500))
+    problems = [('NQueens(8)', search.NQueensProblem(8)),
+                ('Route 4x4', PlanRouteProblem((0, 0, 0), [(2, 3), (3, 2)],
+                                               [(0,0),(0,1),(0,2),(0,3),
+                                                (1,0),(1,1),(1,2),(1,3),
+                                                (2,0),            (2,3),
+                                                (3,0),(3,1),(3,2),(3,3)])),
+                ('Route 16x16', PlanRouteProblem((0, 0, 0), [(15, 15)],
+                                                 random_allowed(16, 16, seed=2))),
+                ('Corridor', PlanRouteProblem((0, 0, 3), [(1499, 0)], corridor))]
+    searchers = [('recursive_best_first_search',
+                  search.recursive_best_first_search),
+                 ('iterative_rbfs_search',
+                  lambda p: search.iterative_rbfs_search(p, table_size=table_size)),
+                 ('iterative_rbfs_search (no table)',
+                  lambda p: search.iterative_rbfs_search(p, table_size=0)),
+                 ('ida_star_search',
+                  lambda p: search.ida_star_search(p, table_size=table_size)),
+                 ('ida_star_search (no table)',
+                  lambda p: search.ida_star_search(p, table_size=0))]
+    table = []
+    for label, searcher in searchers:
+        row, start = [label], time.time()
+        for _, problem in problems:
+            p = search.InstrumentedProblem(problem)
+            try:
+                searcher(p)
+                row.append(p)
+            except RuntimeError: # maximum recursion depth exceeded
+                row.append('(recursion limit)')
+        table.append(row + [time.time() - start])
+    print_table(table, ['Searcher'] + [name for name, _ in problems] + ['Time(s)'],
+                numfmt = '%.3g')
+
+plan_route_strategies = [
+    search.astar_search,
+    ('astar_search (high_g ties)',
+     lambda p: search.astar_search(p, tie='high_g')),
+    ('astar_search (fifo ties)',
+     lambda p: search.astar_search(p, tie='fifo')),
+    ('astar_search (lifo ties)',
+     lambda p: search.astar_search(p, tie='lifo')),
+    ('astar_search (reopen)',
+     lambda p: search.astar_search(p, reopen=True)),
+    search.uniform_cost_search,
+    ('greedy_best_first_graph_search',
+     lambda p: search.greedy_best_first_graph_search(p, p.h)),
+    search.breadth_first_search,
+    search.depth_first_graph_search,
+    search.recursive_best_first_search,
+    search.iterative_rbfs_search,
+    search.ida_star_search]
+
+def compare_plan_route_strategies(sizes=(8, 16, 32), seeds=(0, 1),
+                                  pit_fraction=0.2, strategies=None,
+                                  timeout=30, processes=None,
+                                  csv_file=None, json_file=None):
+    """ Benchmark search strategies for plan_route (see
+    search.benchmark_searchers) on generated grids: for each size and seed,
+    a random_allowed grid with a route from (0,0) heading north to the far
+    corner.  Prints the table and returns the results; csv_file and
+    json_file are passed on. """
+    problems = []
+    for size in sizes:
+        for seed in seeds:
+            allowed = random_allowed(size, size, pit_fraction, seed)
+            problems.append(('%dx%d seed %d' % (size, size, seed),
+                             PlanRouteProblem((0, 0, 0), [(size-1, size-1)],
+                                              allowed)))
+    results = search.benchmark_searchers(problems,
+                                         strategies or plan_route_strategies,
+                                         timeout, processes, csv_file, json_file)
+    search.print_benchmark(results, ['seconds', 'succs', 'expansions_per_sec',
+                                     'memory_kb', 'length', 'cost'])
+    return results
+
 #-------------------------------------------------------------------------------
 # Plan Shot
 #-------------------------------------------------------------------------------